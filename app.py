@@ -1,78 +1,22 @@
 import streamlit as st
-import subprocess
+import os
 import json
-import re
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import graphviz
-import pandas as pd
-
-
-def extract_file_context(uploaded_files):
-    """
-    Extract structured, LLM-friendly summaries from uploaded files
-    instead of dumping full content.
-    """
-    context_snippets = []
-
-    for file in uploaded_files:
-        filename = file.name.lower()
-
-        try:
-            if filename.endswith(".csv"):
-                df = pd.read_csv(file)
-                inferred = {}
-
-                # Infer column data types
-                for col in df.columns:
-                    dtype = str(df[col].dtype)
-                    if "int" in dtype:
-                        inferred[col] = "INT"
-                    elif "float" in dtype or "double" in dtype:
-                        inferred[col] = "FLOAT"
-                    elif "date" in col.lower():
-                        inferred[col] = "DATE"
-                    else:
-                        inferred[col] = "STRING"
-
-                snippet = (
-                    f"File: {file.name}\n"
-                    f"Type: CSV\n"
-                    f"Columns & Types: {inferred}\n"
-                    f"Sample Row: {df.head(1).to_dict(orient='records')[0]}"
-                )
-                context_snippets.append(snippet)
-
-            elif filename.endswith(".json"):
-                data = json.load(file)
-                # If JSON is a list of dicts, infer keys
-                if isinstance(data, list) and len(data) > 0 and isinstance(data[0], dict):
-                    keys = list(data[0].keys())
-                    snippet = (
-                        f"File: {file.name}\n"
-                        f"Type: JSON\n"
-                        f"Top-Level Keys: {keys}\n"
-                        f"Sample Entry: {data[0]}"
-                    )
-                else:
-                    snippet = (
-                        f"File: {file.name}\n"
-                        f"Type: JSON\n"
-                        f"Content Preview: {str(data)[:400]}"
-                    )
-                context_snippets.append(snippet)
-
-            elif filename.endswith(".txt"):
-                text = file.read().decode("utf-8")[:400]
-                snippet = (
-                    f"File: {file.name}\n"
-                    f"Type: TXT\n"
-                    f"Content Preview: {text}"
-                )
-                context_snippets.append(snippet)
 
-        except Exception as e:
-            context_snippets.append(f"Error processing {file.name}: {e}")
+import llm_cache
+import llm_client
+from ddl_generator import extract_schema_info, generate_alter_ddl, generate_ddl, take_until_json
+from file_context import extract_file_context
 
-    return "\n\n".join(context_snippets) if context_snippets else ""
+
+@st.cache_resource(show_spinner=False)
+def parse_pool() -> ProcessPoolExecutor:
+    """One worker pool per server, reused across reruns and sessions."""
+    # Spawned workers: the Streamlit server process is multi-threaded
+    return ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                               mp_context=multiprocessing.get_context("spawn"))
 
 
 # =========================
@@ -121,40 +65,49 @@ uploaded_files = st.file_uploader(
 
 sql_dialect = st.selectbox(
     "Select SQL Dialect:",
-    ["ANSI SQL", "Snowflake", "Databricks", "PostgreSQL", "MySQL"]
+    ["ANSI SQL", "Snowflake", "Databricks", "PostgreSQL", "MySQL", "BigQuery", "SQL Server"]
 )
 
+col_stream, col_json = st.columns(2)
+with col_stream:
+    stream_output = st.checkbox("Stream model output", value=True)
+with col_json:
+    json_mode = st.checkbox(
+        "Constrain output to JSON",
+        value=True,
+        help="Ask the model server for a single valid JSON object instead of free text."
+    )
+
 # =========================
 # Helpers
 # =========================
-def generate_ddl(schema_json, dialect="ANSI SQL"):
-    ddl_statements = []
-    header = f"-- SQL Dialect: {dialect}\n"
-
-    fact = schema_json.get("fact_table")
-    if fact:
-        cols = [f"{c['name']} {c['type']}" for c in fact.get("columns", [])]
-        ddl_statements.append(
-            f"CREATE TABLE {fact['name']} (\n    " + ",\n    ".join(cols) + "\n);"
-        )
+def _parses_as_schema(output: str) -> bool:
+    try:
+        extract_schema_info(output)
+    except ValueError:
+        return False
+    return True
+
+def call_ollama_cached(full_prompt: str, json_format: bool = False, stream: bool = False) -> str:
+    # Disk-backed and shared with other sessions, restarts and main.py;
+    # keyed on the prompt with whitespace normalized
+    messages = [{"role": "user", "content": full_prompt}]
+    options = {"format": "json" if json_format else ""}
+    cached = llm_cache.get(llm_client.LLM_MODEL, messages, options)
+    if cached is not None:
+        return cached
+
+    if stream:
+        with st.expander("Model output", expanded=True):
+            # Stops reading (and generating) once the schema object has closed
+            tokens = take_until_json(llm_client.stream(full_prompt, json_format))
+            output = st.write_stream(tokens).strip()
+    else:
+        output = llm_client.generate(full_prompt, json_format)
 
-    for dim in schema_json.get("dimension_tables", []):
-        cols = [f"{c['name']} {c['type']}" for c in dim.get("columns", [])]
-        ddl_statements.append(
-            f"CREATE TABLE {dim['name']} (\n    " + ",\n    ".join(cols) + "\n);"
-        )
-
-    return header + "\n\n".join(ddl_statements)
-
-@st.cache_data(show_spinner=False)
-def call_ollama_cached(full_prompt: str) -> str:
-    resp = subprocess.run(
-        ["ollama", "run", "llama3"],
-        input=full_prompt.encode("utf-8"),
-        capture_output=True,
-        text=False
-    )
-    return resp.stdout.decode("utf-8").strip()
+    # Outputs without a usable schema are regenerated next time
+    llm_cache.put(llm_client.LLM_MODEL, messages, output, options, validate=_parses_as_schema)
+    return output
 
 def generate_erd(schema_json) -> graphviz.Digraph:
     dot = graphviz.Digraph(comment="Star Schema ERD")
@@ -183,7 +136,12 @@ if st.button("Generate Schema + SQL DDL + ERD", type="primary"):
     else:
         with st.spinner("Generating with Llama 3..."):
             try:
-                file_context = extract_file_context(uploaded_files) if uploaded_files else "No external documents provided."
+                file_context = (
+                    # Sorted so upload order doesn't change the prompt (and cache key)
+                    extract_file_context([(f.name, f.getvalue()) for f in sorted(uploaded_files, key=lambda f: f.name)],
+                                         parse_pool())
+                    if uploaded_files else "No external documents provided."
+                )
                 #if file_context and file_context.strip() != "No external documents provided.":
                 full_prompt = f"""
 
@@ -234,45 +192,47 @@ if st.button("Generate Schema + SQL DDL + ERD", type="primary"):
                 """
 
 
-                output = call_ollama_cached(full_prompt)
+                output = call_ollama_cached(full_prompt, json_format=json_mode, stream=stream_output)
 
                 # Extract JSON from model output
-                match = re.search(r"\{(?:.|\n)*\}", output)
-                if not match:
-                    st.error("⚠️ Could not find JSON in model output. Showing raw text:")
+                try:
+                    schema_json = extract_schema_info(output)
+                except ValueError as e:
+                    st.error(f"{e} Showing raw output:")
                     st.text_area("Raw Output", output, height=300)
                 else:
-                    try:
-                        schema_json = json.loads(match.group(0))
-
-                        st.subheader("🌟 Generated Star Schema (JSON)")
-                        st.json(schema_json)
-
-                        ddl = generate_ddl(schema_json, sql_dialect)
-                        st.subheader("💻 Generated SQL DDL")
-                        st.code(ddl, language="sql")
-
-                        st.download_button(
-                            "Download Schema JSON",
-                            data=json.dumps(schema_json, indent=2),
-                            file_name="data_model_schema.json",
-                            mime="application/json"
-                        )
-                        st.download_button(
-                            "Download SQL DDL",
-                            data=ddl,
-                            file_name="data_model_schema.sql",
-                            mime="text/sql"
-                        )
-
-                        st.subheader("🗺️ ERD Diagram")
-                        erd = generate_erd(schema_json)
-                        # Use Streamlit's built-in Graphviz renderer (no system 'dot' needed)
-                        st.graphviz_chart(erd.source)
-
-                    except json.JSONDecodeError:
-                        st.error("⚠️ JSON parsing failed. Showing raw output:")
-                        st.text_area("Raw Output", output, height=300)
+                    st.subheader("🌟 Generated Star Schema (JSON)")
+                    st.json(schema_json)
+
+                    ddl = f"-- SQL Dialect: {sql_dialect}\n" + generate_ddl(schema_json, sql_dialect)
+                    st.subheader("💻 Generated SQL DDL")
+                    st.code(ddl, language="sql")
+
+                    # Changes against the schema from this session's previous run
+                    previous = st.session_state.get("last_schema")
+                    alter = generate_alter_ddl(previous, schema_json, sql_dialect) if previous else ""
+                    if alter:
+                        with st.expander("🔁 ALTER script from the previous schema"):
+                            st.code(alter, language="sql")
+                    st.session_state["last_schema"] = schema_json
+
+                    st.download_button(
+                        "Download Schema JSON",
+                        data=json.dumps(schema_json, indent=2),
+                        file_name="data_model_schema.json",
+                        mime="application/json"
+                    )
+                    st.download_button(
+                        "Download SQL DDL",
+                        data=ddl,
+                        file_name="data_model_schema.sql",
+                        mime="text/sql"
+                    )
+
+                    st.subheader("🗺️ ERD Diagram")
+                    erd = generate_erd(schema_json)
+                    # Use Streamlit's built-in Graphviz renderer (no system 'dot' needed)
+                    st.graphviz_chart(erd.source)
 
             except Exception as e:
                 st.error(f"❌ Error: {e}")
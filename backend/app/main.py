@@ -1,7 +1,17 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.routers import files, context, vectorstore
+from app.utils import llama_client, workers
 
-app = FastAPI(title="Smart File Context API", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await llama_client.aclose()
+    workers.shutdown()
+
+
+app = FastAPI(title="Smart File Context API", version="0.1.0", lifespan=lifespan)
 
 app.include_router(files.router, prefix="/files", tags=["files"])
 app.include_router(context.router, prefix="/context", tags=["context"])
@@ -1,12 +1,22 @@
+import json
 from pathlib import Path
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from app.services import parser_service, rag_service
+from app.services import parser_service, rag_service, index_jobs
 
 router = APIRouter()
 
 class ExtractRequest(BaseModel):
     path: str
+    # Profile whole CSVs (exact counts, approximate distincts) instead of a sample
+    full_profile: bool = False
+
+class BulkIndexRequest(BaseModel):
+    # A directory, or a glob pattern such as "data/**/*.csv"
+    path: str
+    recursive: bool = True
+    full_profile: bool = False
 
 class QueryRequest(BaseModel):
     query: str
@@ -17,7 +27,7 @@ def extract(req: ExtractRequest):
     p = Path(req.path)
     if not p.exists() or not p.is_file():
         raise HTTPException(status_code=404, detail="File not found")
-    ctx = parser_service.extract_context(p)
+    ctx = parser_service.extract_context(p, full_profile=req.full_profile)
     return {"path": str(p), "context": ctx}
 
 @router.post("/index")
@@ -25,11 +35,44 @@ def index(req: ExtractRequest):
     p = Path(req.path)
     if not p.exists() or not p.is_file():
         raise HTTPException(status_code=404, detail="File not found")
-    ctx = parser_service.extract_context(p)
-    rag_service.index_context(ctx)
-    return {"indexed": True, "path": str(p), "summary": ctx.get("summary")}
+    result = rag_service.index_path(p, full_profile=req.full_profile)
+    return {"path": str(p), **result}
+
+@router.post("/index/bulk", status_code=202)
+def index_bulk(req: BulkIndexRequest):
+    files = index_jobs.find_files(req.path, recursive=req.recursive)
+    if not files:
+        raise HTTPException(status_code=404, detail="No supported files found")
+    return index_jobs.submit(files, full_profile=req.full_profile)
+
+@router.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = index_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 @router.post("/ask")
-def ask(req: QueryRequest):
-    answer = rag_service.answer(req.query, top_k=req.top_k)
+async def ask(req: QueryRequest):
+    # Embedding and chat are awaited on the shared client, so a slow model
+    # call no longer pins a threadpool worker
+    answer = await rag_service.answer_async(req.query, top_k=req.top_k)
     return answer
+
+
+@router.post("/ask/stream")
+async def ask_stream(req: QueryRequest):
+    """
+    Server-Sent Events: one `context` event with the retrieved hits, then a
+    `token` event per completion chunk, then `done` (or `error`).
+    """
+    async def events():
+        try:
+            async for event, data in rag_service.answer_stream(req.query, top_k=req.top_k):
+                yield f"event: {event}\ndata: {json.dumps(data, default=float)}\n\n"
+        except Exception as e:
+            # Headers are already sent, so failures are reported in-band
+            yield f"event: error\ndata: {json.dumps(str(e))}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
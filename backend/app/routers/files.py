@@ -1,28 +1,178 @@
 import os
+import asyncio
+import tempfile
 from pathlib import Path
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from typing import Any, Callable, Dict, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Request
 from app.services import parser_service
+from app.utils import workers
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
 
 UPLOAD_DIR = Path("backend/data/uploads")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+# The request body is parsed as it arrives and the file part written to disk
+# about UPLOAD_CHUNK bytes at a time; uploads past MAX_UPLOAD_BYTES are
+# rejected from Content-Length up front, or as soon as the file part outgrows it
+UPLOAD_CHUNK = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(2 * 1024 ** 3)))
+# Room for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Documents the multipart body the handler parses itself
+_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["file"],
+            "properties": {"file": {"type": "string", "format": "binary"}},
+        }}},
+    }
+}
 
 router = APIRouter()
 
-@router.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
-    dest = UPLOAD_DIR / file.filename
-    with open(dest, "wb") as f:
-        f.write(await file.read())
+
+class _FilePart:
+    """
+    MultipartParser callbacks keeping the first part named `field` that
+    carries a filename. Its bytes collect in `pending` until the caller
+    writes them out.
+    """
+
+    def __init__(self, field: str = "file"):
+        self.field = field.encode()
+        self.filename: Optional[str] = None
+        self.pending = bytearray()
+        self.size = 0
+        self.complete = False
+        self._in_file = False
+        self._headers: Dict[bytes, bytes] = {}
+        self._name = bytearray()
+        self._value = bytearray()
+
+    def callbacks(self) -> Dict[str, Callable[..., Any]]:
+        return {
+            "on_part_begin": self._part_begin,
+            "on_header_field": lambda data, start, end: self._name.extend(data[start:end]),
+            "on_header_value": lambda data, start, end: self._value.extend(data[start:end]),
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished,
+            "on_part_data": self._part_data,
+            "on_part_end": self._part_end,
+        }
+
+    def _part_begin(self):
+        self._headers = {}
+
+    def _header_end(self):
+        self._headers[bytes(self._name).lower()] = bytes(self._value)
+        self._name.clear()
+        self._value.clear()
+
+    def _headers_finished(self):
+        _, params = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if self.filename is None and params.get(b"name") == self.field and b"filename" in params:
+            self.filename = params[b"filename"].decode("utf-8", errors="replace")
+            self._in_file = True
+
+    def _part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            self.pending.extend(data[start:end])
+            self.size += end - start
+
+    def _part_end(self):
+        if self._in_file:
+            self._in_file = False
+            self.complete = True
+
+
+def _finish(f, tmp: str, dest: Path):
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+    # mkstemp creates the file 0600; uploads stay readable like a plain open()'s
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, dest)
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File exceeds {MAX_UPLOAD_BYTES} bytes")
+
+
+def _feed(parser: MultipartParser, chunk: Optional[bytes]):
+    """Write `chunk` to the parser, or finalize it for None."""
+    try:
+        if chunk is None:
+            parser.finalize()
+        else:
+            parser.write(chunk)
+    except ValueError as e:  # python-multipart's parse errors
+        raise HTTPException(status_code=400, detail=f"Malformed multipart body: {e}")
+
+
+async def _receive_upload(request: Request) -> Tuple[str, Path]:
+    """
+    Parse the multipart body as it streams in and write its `file` part to
+    a temp file in UPLOAD_DIR, then rename that into place under the
+    client's base file name, so readers never see a partial upload and the
+    body is written to disk once.
+    """
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD:
+        raise _too_large()
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+    part = _FilePart()
+    parser = MultipartParser(boundary, part.callbacks())
+    fd, tmp = tempfile.mkstemp(dir=UPLOAD_DIR, prefix=".upload-", suffix=".part")
+    f = os.fdopen(fd, "wb")
+    try:
+        async for chunk in request.stream():
+            _feed(parser, chunk)
+            if part.size > MAX_UPLOAD_BYTES:
+                raise _too_large()
+            if len(part.pending) >= UPLOAD_CHUNK:
+                data = bytes(part.pending)
+                part.pending.clear()
+                await asyncio.to_thread(f.write, data)
+        _feed(parser, None)
+        # Drop any directory parts a client put in the name
+        name = Path(part.filename or "").name
+        if not part.complete or not name:
+            raise HTTPException(status_code=400, detail="No file part named 'file'")
+        if name in (".", "..") or name.startswith(".upload-"):
+            raise HTTPException(status_code=400, detail=f"Invalid file name: {name}")
+        await asyncio.to_thread(f.write, bytes(part.pending))
+        dest = UPLOAD_DIR / name
+        await asyncio.to_thread(_finish, f, tmp, dest)
+        return part.filename, dest  # type: ignore
+    except BaseException:
+        f.close()
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+@router.post("/upload", openapi_extra=_UPLOAD_BODY)
+async def upload_file(request: Request):
+    filename, dest = await _receive_upload(request)
 
     try:
-        ctx = parser_service.extract_context(dest)
+        # Parsing is CPU-bound; run it on the worker pool, off the event loop
+        ctx = await workers.run_cpu(parser_service.extract_context, dest)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to parse file: {e}")
 
-    return {"filename": file.filename, "path": str(dest), "context": ctx}
+    return {"filename": filename, "path": str(dest), "context": ctx}
 
 @router.get("/")
 async def list_files():
     return {
-        "files": [p.name for p in UPLOAD_DIR.glob("*") if p.is_file()]
+        "files": [p.name for p in UPLOAD_DIR.glob("*") if p.is_file() and not p.name.startswith(".upload-")]
     }
@@ -1,5 +1,7 @@
 from fastapi import APIRouter
 from app.vectorstore import tiny_store
+from app.services import embedding_cache
+from app.utils import llama_client
 
 router = APIRouter()
 
@@ -7,3 +9,13 @@ router = APIRouter()
 def clear_store():
     tiny_store.clear()
     return {"cleared": True}
+
+@router.get("/embedding-cache")
+def embedding_cache_stats():
+    return embedding_cache.stats()
+
+@router.get("/llm-cache")
+def llm_cache_stats():
+    if llama_client.llm_cache is None:
+        return {"enabled": False}
+    return {"enabled": llama_client.llm_cache.LLM_CACHE_ENABLED, **llama_client.llm_cache.stats()}
@@ -0,0 +1,134 @@
+from __future__ import annotations
+import os
+import datetime
+import decimal
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+
+try:  # optional dependency: parser_service falls back to pandas without it
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.json as pa_json
+except ImportError:
+    pa = None
+
+AVAILABLE = pa is not None
+# Bytes per CSV/JSON block; Arrow parses blocks on its thread pool and
+# infers column types from the first one
+ARROW_BLOCK_SIZE = int(os.getenv("ARROW_BLOCK_SIZE", str(16 * 1024 * 1024)))
+
+
+def _read_options(encoding: Optional[str]) -> "pa_csv.ReadOptions":
+    return pa_csv.ReadOptions(use_threads=True, block_size=ARROW_BLOCK_SIZE,
+                              encoding=encoding or "utf8")
+
+
+def _convert_options() -> "pa_csv.ConvertOptions":
+    # Empty and NA-like cells are null in string columns too, as in pandas,
+    # so null/unique counts agree between engines
+    return pa_csv.ConvertOptions(strings_can_be_null=True)
+
+
+def json_safe(v: Any) -> Any:
+    """
+    Arrow scalar value -> JSON-serializable Python. Arrow infers date and
+    timestamp columns that pandas leaves as strings; those become ISO 8601.
+    """
+    if isinstance(v, (datetime.date, datetime.time)):  # datetime is a date
+        return v.isoformat()
+    if isinstance(v, datetime.timedelta):
+        return str(v)
+    if isinstance(v, decimal.Decimal):
+        return float(v)
+    if isinstance(v, bytes):
+        return v.decode("utf-8", errors="replace")
+    if isinstance(v, dict):
+        return {k: json_safe(x) for k, x in v.items()}
+    if isinstance(v, list):
+        return [json_safe(x) for x in v]
+    return v.item() if isinstance(v, np.generic) else v
+
+
+def rows(table: Any) -> List[Dict[str, Any]]:
+    """A table or record batch as JSON-safe row dicts."""
+    return [json_safe(r) for r in table.to_pylist()]
+
+
+def iter_csv_batches(p: Path, encoding: Optional[str] = None) -> Iterator["pa.RecordBatch"]:
+    """Stream a CSV as Arrow record batches of about ARROW_BLOCK_SIZE bytes."""
+    with pa_csv.open_csv(p, read_options=_read_options(encoding),
+                         convert_options=_convert_options()) as reader:
+        for batch in reader:
+            yield batch
+
+
+def read_csv(p: Path, encoding: Optional[str] = None, max_rows: Optional[int] = None) -> "pa.Table":
+    """Read a CSV (multithreaded), stopping once `max_rows` rows are parsed."""
+    if max_rows is None:
+        return pa_csv.read_csv(p, read_options=_read_options(encoding),
+                               convert_options=_convert_options())
+    batches: List["pa.RecordBatch"] = []
+    n = 0
+    with pa_csv.open_csv(p, read_options=_read_options(encoding),
+                         convert_options=_convert_options()) as reader:
+        schema = reader.schema
+        for batch in reader:
+            batches.append(batch)
+            n += batch.num_rows
+            if n >= max_rows:
+                break
+    return pa.Table.from_batches(batches, schema=schema).slice(0, max_rows)
+
+
+def read_json_lines(p: Path) -> "pa.Table":
+    """Newline-delimited JSON. Arrow has no reader for a top-level JSON array."""
+    return pa_json.read_json(p, read_options=pa_json.ReadOptions(use_threads=True,
+                                                                 block_size=ARROW_BLOCK_SIZE))
+
+
+def dtype_name(t: "pa.DataType") -> str:
+    """The pandas dtype name for an Arrow type, so summaries match the pandas path."""
+    try:
+        return str(np.dtype(t.to_pandas_dtype()))
+    except (NotImplementedError, TypeError):
+        return str(t)
+
+
+def first_valid(arr: Any) -> Any:
+    valid = pc.drop_null(arr)
+    return json_safe(valid[0].as_py()) if len(valid) else None
+
+
+def min_max(arr: Any) -> Tuple[Any, Any]:
+    mm = pc.min_max(arr)
+    return json_safe(mm["min"].as_py()), json_safe(mm["max"].as_py())
+
+
+def value_counts(arr: Any) -> Iterator[Tuple[Any, int]]:
+    """(value, count) pairs for the non-null entries of `arr`."""
+    vc = pc.value_counts(pc.drop_null(arr))
+    return zip(map(json_safe, vc.field("values").to_pylist()), vc.field("counts").to_pylist())
+
+
+def summarize_table(table: "pa.Table") -> Dict[str, Any]:
+    """
+    Same shape as parser_service._summarize_dataframe, computed with Arrow
+    compute kernels instead of per-column pandas operations.
+    """
+    cols = []
+    for name, col in zip(table.column_names, table.columns):
+        cols.append({
+            "name": name,
+            "dtype": dtype_name(col.type),
+            "nulls": int(col.null_count),
+            "unique": int(pc.count_distinct(col, mode="only_valid").as_py()),
+            "example": first_valid(col.slice(0, 5)),
+        })
+    return {
+        "n_rows": int(table.num_rows),
+        "n_cols": int(table.num_columns),
+        "columns": cols,
+        "samples": rows(table.slice(0, 5)),
+    }
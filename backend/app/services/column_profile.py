@@ -0,0 +1,205 @@
+from __future__ import annotations
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from app.services import arrow_parser
+
+# Rows per pd.read_csv chunk; memory is bounded by this, not the file size
+PROFILE_CHUNK_ROWS = int(os.getenv("PROFILE_CHUNK_ROWS", "100000"))
+HLL_PRECISION = 14  # 2**14 registers: ~0.8% standard error, 16 KB per column
+TOP_K = 5
+MG_COUNTERS = 64
+
+
+def _py(v: Any) -> Any:
+    """numpy scalar -> plain Python, so summaries stay JSON-serializable."""
+    return v.item() if isinstance(v, np.generic) else v
+
+
+def _hash(s: pd.Series) -> np.ndarray:
+    # Chunks can infer different dtypes for one column (int vs float once a
+    # NaN appears), so numbers hash as float64 and everything else as str
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        s = s.astype(np.float64)
+    else:
+        s = s.astype(str)
+    return pd.util.hash_pandas_object(s, index=False).to_numpy(dtype=np.uint64)
+
+
+class HyperLogLog:
+    """Approximate distinct count in 2**p one-byte registers."""
+
+    def __init__(self, p: int = HLL_PRECISION):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def add_hashes(self, h: np.ndarray):
+        if not h.size:
+            return
+        idx = (h >> np.uint64(64 - self.p)).astype(np.int64)
+        w = h & np.uint64((1 << (64 - self.p)) - 1)
+        # rank = leading zeros in the low (64 - p) bits, plus one
+        bits = np.zeros(w.shape, dtype=np.int64)
+        nz = w > 0
+        bits[nz] = np.floor(np.log2(w[nz].astype(np.float64))).astype(np.int64) + 1
+        rank = (64 - self.p - bits + 1).astype(np.uint8)
+        order = np.argsort(idx, kind="stable")
+        idx, rank = idx[order], rank[order]
+        starts = np.flatnonzero(np.r_[True, idx[1:] != idx[:-1]])
+        best = np.maximum.reduceat(rank, starts)
+        cells = idx[starts]
+        self.registers[cells] = np.maximum(self.registers[cells], best)
+
+    def count(self) -> int:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        est = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if est <= 2.5 * m and zeros:
+            est = m * np.log(m / zeros)  # linear counting for small cardinalities
+        return int(round(est))
+
+
+class MisraGries:
+    """
+    Heavy hitters with at most `capacity` counters. Reported counts are lower
+    bounds, each short by at most n / (capacity + 1).
+    """
+
+    def __init__(self, capacity: int = MG_COUNTERS):
+        self.capacity = capacity
+        self.counters: Dict[Any, int] = {}
+
+    def add_counts(self, counts: Iterable[Tuple[Any, int]]):
+        merged = dict(self.counters)
+        for value, c in counts:
+            value = _py(value)
+            merged[value] = merged.get(value, 0) + int(c)
+        if len(merged) > self.capacity:
+            # Mergeable-summary step: subtract the (capacity+1)-th largest count
+            cut = sorted(merged.values(), reverse=True)[self.capacity]
+            merged = {v: c - cut for v, c in merged.items() if c > cut}
+        self.counters = merged
+
+    def top(self, k: int = TOP_K) -> List[Dict[str, Any]]:
+        best = sorted(self.counters.items(), key=lambda kv: kv[1], reverse=True)[:k]
+        return [{"value": v, "count": c} for v, c in best]
+
+
+def _merge_extreme(a: Any, b: Any, pick) -> Any:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    try:
+        return pick(a, b)
+    except TypeError:
+        return pick(str(a), str(b))
+
+
+class _ColumnProfile:
+    def __init__(self, name: str):
+        self.name = name
+        self.dtypes: List[str] = []
+        self.nulls = 0
+        self.min: Any = None
+        self.max: Any = None
+        self.example: Any = None
+        self.hll = HyperLogLog()
+        self.mg = MisraGries()
+
+    def update(self, s: pd.Series):
+        dtype = str(s.dtype)
+        if dtype not in self.dtypes:
+            self.dtypes.append(dtype)
+        present = s.dropna()
+        self.nulls += int(s.size - present.size)
+        if not present.size:
+            return
+        if self.example is None:
+            self.example = _py(present.iloc[0])
+        if not pd.api.types.is_numeric_dtype(present):
+            present = present.astype(str)
+        self.min = _merge_extreme(self.min, _py(present.min()), min)
+        self.max = _merge_extreme(self.max, _py(present.max()), max)
+        self.hll.add_hashes(_hash(present))
+        self.mg.add_counts(present.value_counts(sort=False).items())
+
+    def update_arrow(self, arr: Any):
+        """`update` for an Arrow array; counts and extremes use compute kernels."""
+        dtype = arrow_parser.dtype_name(arr.type)
+        if dtype not in self.dtypes:
+            self.dtypes.append(dtype)
+        self.nulls += int(arr.null_count)
+        if arr.null_count == len(arr):
+            return
+        if self.example is None:
+            self.example = arrow_parser.first_valid(arr)
+        lo, hi = arrow_parser.min_max(arr)
+        self.min = _merge_extreme(self.min, lo, min)
+        self.max = _merge_extreme(self.max, hi, max)
+        self.hll.add_hashes(_hash(arr.to_pandas().dropna()))
+        self.mg.add_counts(arrow_parser.value_counts(arr))
+
+    def dtype(self) -> str:
+        if len(self.dtypes) == 1:
+            return self.dtypes[0]
+        try:
+            return str(np.result_type(*self.dtypes))
+        except TypeError:
+            return "object"
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "dtype": self.dtype(),
+            "nulls": self.nulls,
+            "unique": self.hll.count(),
+            "example": self.example,
+            "min": self.min,
+            "max": self.max,
+            "top_values": self.mg.top(),
+        }
+
+
+def profile_csv(p: Path, encoding: Optional[str] = None,
+                chunksize: int = PROFILE_CHUNK_ROWS, engine: str = "pandas") -> Dict[str, Any]:
+    """
+    Profile a whole CSV in one streaming pass of `chunksize`-row chunks, or
+    of Arrow record batches with engine="arrow".
+
+    Row and null counts and min/max are exact; `unique` is a HyperLogLog
+    estimate and `top_values` a Misra-Gries summary. Returns the same shape
+    as parser_service's sampled summary, plus min/max/top_values per column.
+    """
+    n_rows = 0
+    columns: Dict[str, _ColumnProfile] = {}
+    samples: List[Dict[str, Any]] = []
+    if engine == "arrow":
+        for batch in arrow_parser.iter_csv_batches(p, encoding):
+            if not samples:
+                samples = arrow_parser.rows(batch.slice(0, 5))
+            for c, arr in zip(batch.schema.names, batch.columns):
+                if c not in columns:
+                    columns[c] = _ColumnProfile(c)
+                columns[c].update_arrow(arr)
+            n_rows += int(batch.num_rows)
+    else:
+        for chunk in pd.read_csv(p, encoding=encoding, chunksize=chunksize):
+            if not samples:
+                samples = chunk.head(5).to_dict(orient="records")
+            for c in chunk.columns:
+                if c not in columns:
+                    columns[c] = _ColumnProfile(c)
+                columns[c].update(chunk[c])
+            n_rows += int(chunk.shape[0])
+    return {
+        "n_rows": n_rows,
+        "n_cols": len(columns),
+        "columns": [col.summary() for col in columns.values()],
+        "samples": samples,
+        "profile": "full",
+    }
@@ -0,0 +1,142 @@
+from __future__ import annotations
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Dict, Any
+import numpy as np
+
+from app.utils.sqlite_lru import SQLiteLRU
+
+CACHE_PATH = Path(os.getenv("EMBED_CACHE_PATH", "backend/data/embed_cache.sqlite3"))
+CACHE_ENABLED = os.getenv("EMBED_CACHE", "1") == "1"
+# On-disk size bound; least recently used rows are evicted down to 90% of it
+MAX_BYTES = int(os.getenv("EMBED_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Vectors held in the in-process LRU in front of SQLite
+MEMORY_ITEMS = int(os.getenv("EMBED_CACHE_MEMORY_ITEMS", "10000"))
+
+
+def cache_key(model: str, text: str) -> str:
+    return model + ":" + hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache keyed on (model, sha256(text)).
+
+    An OrderedDict LRU sits in front of a SQLite table shared by every worker
+    on the host. Lookups refresh `last_used`; inserts evict the least recently
+    used rows once the table grows past MAX_BYTES.
+    """
+
+    def __init__(self, path: Path = CACHE_PATH, max_bytes: int = MAX_BYTES,
+                 memory_items: int = MEMORY_ITEMS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.hits = 0
+        self.misses = 0
+        self._mem: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._store = SQLiteLRU(
+            path, "embeddings",
+            "key TEXT PRIMARY KEY, vec BLOB NOT NULL, nbytes INTEGER NOT NULL, last_used REAL NOT NULL",
+            max_bytes,
+        )
+
+    def _remember(self, key: str, vec: np.ndarray):
+        self._mem[key] = vec
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.memory_items:
+            self._mem.popitem(last=False)
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        keys = [cache_key(model, t) for t in texts]
+        out: List[Optional[np.ndarray]] = [None] * len(keys)
+        with self._lock:
+            pending: Dict[str, List[int]] = {}
+            for i, k in enumerate(keys):
+                if k in self._mem:
+                    self._mem.move_to_end(k)
+                    out[i] = self._mem[k]
+                else:
+                    pending.setdefault(k, []).append(i)
+
+            if pending:
+                db = self._store.conn()
+                found = []
+                wanted = list(pending)
+                for start in range(0, len(wanted), 500):  # SQLite variable limit
+                    chunk = wanted[start:start + 500]
+                    rows = db.execute(
+                        f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                    ).fetchall()
+                    for k, blob in rows:
+                        vec = np.frombuffer(blob, dtype=np.float32)
+                        self._remember(k, vec)
+                        for i in pending[k]:
+                            out[i] = vec
+                        found.append(k)
+                if found:
+                    self._store.touch(found, time.time())
+
+            n_hits = sum(v is not None for v in out)
+            self.hits += n_hits
+            self.misses += len(out) - n_hits
+        return out
+
+    def put_many(self, model: str, texts: List[str], vecs: np.ndarray):
+        now = time.time()
+        rows = []
+        with self._lock:
+            for t, v in zip(texts, vecs):
+                k = cache_key(model, t)
+                v = np.ascontiguousarray(v, dtype=np.float32)
+                self._remember(k, v)
+                rows.append((k, v.tobytes(), v.nbytes, now))
+            db = self._store.conn()
+            db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            db.commit()
+            for k in self._store.evict():
+                self._mem.pop(k, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, nbytes = self._store.size()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_items": len(self._mem),
+                "disk_entries": entries,
+                "disk_bytes": nbytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            self._store.clear()
+
+
+_cache = EmbeddingCache()
+
+
+def get_many(model: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+    return _cache.get_many(model, texts)
+
+
+def put_many(model: str, texts: List[str], vecs: np.ndarray):
+    _cache.put_many(model, texts, vecs)
+
+
+def stats() -> Dict[str, Any]:
+    """Hit/miss counters and size of the embedding cache."""
+    return _cache.stats()
+
+
+def clear():
+    _cache.clear()
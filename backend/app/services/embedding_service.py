@@ -1,24 +1,185 @@
 from __future__ import annotations
 import os
-from typing import List
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Callable, TypeVar, Awaitable, Optional
 import numpy as np
 import ollama
+from app.services import embedding_cache
+from app.utils import llama_client
 
 EMBED_MODEL = os.getenv("EMBED_MODEL", "nomic-embed-text")
+# Texts per /api/embed request, and how many requests may be in flight at once
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "3"))
+EMBED_RETRY_BACKOFF = float(os.getenv("EMBED_RETRY_BACKOFF", "0.5"))
+
+logger = logging.getLogger(__name__)
+T = TypeVar("T")
+
+_batch_supported = True
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=EMBED_CONCURRENCY, thread_name_prefix="embed")
+        return _pool
+
+
+def _retryable(e: Exception) -> bool:
+    # Client errors (bad model name, unknown endpoint) won't succeed on retry
+    if isinstance(e, ollama.ResponseError):
+        return e.status_code >= 500 or e.status_code == 429
+    return not isinstance(e, (AttributeError, TypeError, ValueError))
+
+
+def _with_retry(fn: Callable[[], T]) -> T:
+    """Call `fn`, retrying transient failures with exponential backoff."""
+    for attempt in range(EMBED_MAX_RETRIES + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == EMBED_MAX_RETRIES or not _retryable(e):
+                raise
+            delay = EMBED_RETRY_BACKOFF * (2 ** attempt)
+            logger.warning("Embedding request failed (%s); retrying in %.1fs", e, delay)
+            time.sleep(delay)
+
+
+async def _with_retry_async(fn: Callable[[], Awaitable[T]]) -> T:
+    for attempt in range(EMBED_MAX_RETRIES + 1):
+        try:
+            return await fn()
+        except Exception as e:
+            if attempt == EMBED_MAX_RETRIES or not _retryable(e):
+                raise
+            delay = EMBED_RETRY_BACKOFF * (2 ** attempt)
+            logger.warning("Embedding request failed (%s); retrying in %.1fs", e, delay)
+            await asyncio.sleep(delay)
+
+
+def _batch_unsupported(e: Exception) -> bool:
+    """True when the client or server predates the batch /api/embed endpoint."""
+    if isinstance(e, AttributeError):
+        return True
+    return (isinstance(e, ollama.ResponseError) and e.status_code == 404
+            and "model" not in str(e.error).lower())
+
+
+def _embed_batch(batch: List[str]) -> List[List[float]]:
+    resp = _with_retry(lambda: ollama.embed(model=EMBED_MODEL, input=batch))
+    return resp["embeddings"]  # type: ignore
+
+
+def _embed_one(text: str) -> List[float]:
+    resp = _with_retry(lambda: ollama.embeddings(model=EMBED_MODEL, prompt=text))
+    return resp["embedding"]  # type: ignore
 
 
 def embed_texts(texts: List[str]) -> np.ndarray:
     """
     Uses Ollama's embedding model to convert a list of texts
     into a NumPy array of shape (n_texts, embedding_dim).
+
+    Texts already in the embedding cache are served from it; only the
+    distinct misses reach the model.
     """
-    vecs = []
-    for t in texts:
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    if not embedding_cache.CACHE_ENABLED:
+        return _embed_uncached(texts)
+
+    cached = embedding_cache.get_many(EMBED_MODEL, texts)
+    missing = _missing(texts, cached)
+    if missing:
+        fresh = _embed_uncached(missing)
+        embedding_cache.put_many(EMBED_MODEL, missing, fresh)
+        cached = _fill(texts, cached, missing, fresh)
+    return np.array(cached, dtype=np.float32)
+
+
+async def embed_texts_async(texts: List[str]) -> np.ndarray:
+    """Async `embed_texts` over the shared AsyncClient, with the same cache."""
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    if not embedding_cache.CACHE_ENABLED:
+        return await _embed_uncached_async(texts)
+
+    # SQLite lookups block, so they run in a worker thread
+    cached = await asyncio.to_thread(embedding_cache.get_many, EMBED_MODEL, texts)
+    missing = _missing(texts, cached)
+    if missing:
+        fresh = await _embed_uncached_async(missing)
+        await asyncio.to_thread(embedding_cache.put_many, EMBED_MODEL, missing, fresh)
+        cached = _fill(texts, cached, missing, fresh)
+    return np.array(cached, dtype=np.float32)
+
+
+def _missing(texts: List[str], cached: List[Optional[np.ndarray]]) -> List[str]:
+    """Distinct texts the cache had no vector for, in first-seen order."""
+    return list(dict.fromkeys(t for t, v in zip(texts, cached) if v is None))
+
+
+def _fill(texts: List[str], cached: List[Optional[np.ndarray]], missing: List[str],
+          fresh: np.ndarray) -> List[np.ndarray]:
+    by_text = dict(zip(missing, fresh))
+    return [by_text[t] if v is None else v for t, v in zip(texts, cached)]
+
+
+def _embed_uncached(texts: List[str]) -> np.ndarray:
+    """
+    Texts are sent EMBED_BATCH_SIZE at a time through /api/embed, with up to
+    EMBED_CONCURRENCY requests in flight. Servers without the batch endpoint
+    get one /api/embeddings request per text on the same bounded pool. Rows
+    keep the input order.
+    """
+    global _batch_supported
+    if _batch_supported:
+        batches = [texts[i:i + EMBED_BATCH_SIZE] for i in range(0, len(texts), EMBED_BATCH_SIZE)]
+        try:
+            results = list(_executor().map(_embed_batch, batches))
+            return np.array([v for r in results for v in r], dtype=np.float32)
+        except Exception as e:
+            if not _batch_unsupported(e):
+                raise
+            logger.warning("Batch embedding unavailable (%s); falling back to per-text requests", e)
+            _batch_supported = False
+
+    return np.array(list(_executor().map(_embed_one, texts)), dtype=np.float32)
+
+
+async def _embed_uncached_async(texts: List[str]) -> np.ndarray:
+    global _batch_supported
+    client = llama_client.async_client()
+    slot = llama_client.model_slot(EMBED_MODEL, EMBED_CONCURRENCY)
+
+    async def batch(b: List[str]) -> List[List[float]]:
+        async with slot:
+            resp = await _with_retry_async(lambda: client.embed(model=EMBED_MODEL, input=b))
+        return resp["embeddings"]  # type: ignore
+
+    async def one(t: str) -> List[float]:
+        async with slot:
+            resp = await _with_retry_async(lambda: client.embeddings(model=EMBED_MODEL, prompt=t))
+        return resp["embedding"]  # type: ignore
+
+    if _batch_supported:
+        batches = [texts[i:i + EMBED_BATCH_SIZE] for i in range(0, len(texts), EMBED_BATCH_SIZE)]
         try:
-            resp = ollama.embeddings(model=EMBED_MODEL, prompt=t)
+            results = await asyncio.gather(*(batch(b) for b in batches))
+            return np.array([v for r in results for v in r], dtype=np.float32)
         except Exception as e:
-            print(f"Embedding error: {e}")
-            raise
+            if not _batch_unsupported(e):
+                raise
+            logger.warning("Batch embedding unavailable (%s); falling back to per-text requests", e)
+            _batch_supported = False
 
-        vecs.append(resp["embedding"])  # type: ignore
-    return np.array(vecs, dtype=np.float32)
+    return np.array(await asyncio.gather(*(one(t) for t in texts)), dtype=np.float32)
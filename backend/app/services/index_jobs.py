@@ -0,0 +1,181 @@
+from __future__ import annotations
+import os
+import glob
+import time
+import uuid
+import queue
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from app.services import parser_service, rag_service
+from app.services.embedding_service import embed_texts
+from app.vectorstore import tiny_store
+from app.utils import workers
+
+# Rows embedded and written to the store per coalesced write
+BULK_FLUSH_ROWS = int(os.getenv("BULK_FLUSH_ROWS", "2048"))
+# Jobs remembered for /context/jobs/{id}, oldest dropped first
+MAX_JOBS = 200
+MAX_ERRORS = 100
+
+logger = logging.getLogger(__name__)
+
+_jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_lock = threading.Lock()
+_queue: "queue.Queue" = queue.Queue()
+_runner: Optional[threading.Thread] = None
+
+
+def find_files(pattern: str, recursive: bool = True) -> List[Path]:
+    """Supported files under a directory, or matching a glob pattern."""
+    root = Path(pattern)
+    if root.is_dir():
+        candidates = root.rglob("*") if recursive else root.glob("*")
+    else:
+        candidates = (Path(p) for p in glob.iglob(pattern, recursive=recursive))
+    return sorted(p for p in candidates if p.is_file() and p.suffix.lower() in parser_service.SUPPORTED)
+
+
+def submit(files: List[Path], full_profile: bool = False) -> Dict[str, Any]:
+    """Queue a bulk indexing job; jobs run one at a time in submission order."""
+    job = {
+        "id": uuid.uuid4().hex,
+        "status": "queued",
+        "total": len(files),
+        "processed": 0,
+        "indexed": 0,
+        "unchanged": 0,
+        "failed": 0,
+        "rows": 0,
+        "errors": [],
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+    }
+    with _lock:
+        _jobs[job["id"]] = job
+        while len(_jobs) > MAX_JOBS:
+            _jobs.popitem(last=False)
+    _queue.put((job["id"], files, full_profile))
+    _ensure_runner()
+    return get(job["id"])  # type: ignore
+
+
+def get(job_id: str) -> Optional[Dict[str, Any]]:
+    with _lock:
+        job = _jobs.get(job_id)
+        return {**job, "errors": list(job["errors"])} if job else None
+
+
+def _update(job_id: str, **counts: int):
+    with _lock:
+        job = _jobs.get(job_id)
+        if job:
+            for k, n in counts.items():
+                job[k] += n
+
+
+def _set(job_id: str, **fields: Any):
+    with _lock:
+        job = _jobs.get(job_id)
+        if job:
+            job.update(fields)
+
+
+def _fail(job_id: str, p: Path, e: Exception):
+    logger.warning("Bulk indexing failed for %s: %s", p, e)
+    with _lock:
+        job = _jobs.get(job_id)
+        if job:
+            job["failed"] += 1
+            job["processed"] += 1
+            if len(job["errors"]) < MAX_ERRORS:
+                job["errors"].append({"path": str(p), "error": str(e)})
+
+
+def _run(job_id: str, files: List[Path], full_profile: bool):
+    """
+    Skip files whose size/mtime match the store, parse the rest in parallel
+    on the worker pool, and embed and write their rows BULK_FLUSH_ROWS at a
+    time, each batch as a single store generation. Files that were only
+    touched get their new mtime recorded, also in batches.
+    """
+    texts: List[str] = []
+    metas: List[Dict[str, Any]] = []
+    # Paths whose previous rows were already dropped by an earlier flush
+    dropped: set = set()
+    # Fresh fingerprints of files whose content hash matched the store
+    touched: Dict[str, Dict[str, Any]] = {}
+
+    def flush_touched():
+        if touched:
+            tiny_store.update_metadata(rag_service.refreshed_fingerprints(touched))
+            touched.clear()
+
+    def flush():
+        if not texts:
+            return
+        vecs = embed_texts(texts)
+        fresh = [p for p in dict.fromkeys(m["path"] for m in metas) if p not in dropped]
+        tiny_store.replace_many(fresh, vecs, metas)
+        dropped.update(fresh)
+        _update(job_id, rows=len(metas))
+        texts.clear()
+        metas.clear()
+
+    futures = {}
+    for p in files:
+        try:
+            old = rag_service.reusable_fingerprint(tiny_store.get_metadata(str(p)), full_profile)
+            if rag_service.stat_unchanged(p, old):
+                _update(job_id, unchanged=1, processed=1)
+                continue
+        except OSError as e:
+            _fail(job_id, p, e)
+            continue
+        futures[workers.submit(parser_service.extract_if_changed, p, old, full_profile)] = p
+
+    for fut in as_completed(futures):
+        p = futures[fut]
+        try:
+            fingerprint, ctx = fut.result()
+        except Exception as e:
+            _fail(job_id, p, e)
+            continue
+        if ctx is None:
+            touched[str(p)] = fingerprint
+            if len(touched) >= BULK_FLUSH_ROWS:
+                flush_touched()
+            _update(job_id, unchanged=1, processed=1)
+            continue
+        for text, meta in rag_service.index_rows(ctx):
+            texts.append(text)
+            metas.append(meta)
+            if len(texts) >= BULK_FLUSH_ROWS:
+                flush()
+        _update(job_id, indexed=1, processed=1)
+    flush()
+    flush_touched()
+
+
+def _work():
+    while True:
+        job_id, files, full_profile = _queue.get()
+        _set(job_id, status="running", started_at=time.time())
+        try:
+            _run(job_id, files, full_profile)
+            _set(job_id, status="done", finished_at=time.time())
+        except Exception as e:
+            logger.exception("Bulk indexing job %s failed", job_id)
+            _set(job_id, status="failed", error=str(e), finished_at=time.time())
+
+
+def _ensure_runner():
+    global _runner
+    with _lock:
+        if _runner is None or not _runner.is_alive():
+            _runner = threading.Thread(target=_work, name="index-jobs", daemon=True)
+            _runner.start()
@@ -1,44 +1,221 @@
 from __future__ import annotations
+import os
+import codecs
+import logging
+import hashlib
 import json
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Iterator, Optional, Tuple
 import pandas as pd
 import chardet
+from app.services import arrow_parser, column_profile
 
 SUPPORTED = {".csv", ".json", ".xlsx", ".xls",".txt"}
+# Rows read for the default (sampled) tabular summary
+SAMPLE_ROWS = 5000
+# Profile whole CSVs in a streaming pass instead of the first SAMPLE_ROWS
+FULL_PROFILE = os.getenv("FULL_PROFILE", "0") == "1"
+# "arrow" parses CSV and JSON-lines files with pyarrow when it is installed
+PARSER_ENGINE = os.getenv("PARSER_ENGINE", "pandas")
+HASH_CHUNK = 1 << 20
+# Text documents are indexed as overlapping chunks of about CHUNK_CHARS
+# characters, read READ_CHARS at a time so memory stays bounded
+CHUNK_CHARS = int(os.getenv("CHUNK_CHARS", "2000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+READ_CHARS = 1 << 16
+PREVIEW_CHARS = 200
+# Bytes checked for a BOM / valid UTF-8, and the smaller slice handed to
+# chardet when neither settles it
+ENCODING_SAMPLE = 100000
+CHARDET_SAMPLE = 20000
+# UTF-32 LE's BOM starts with UTF-16 LE's, so it is checked first
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
 
+logger = logging.getLogger(__name__)
 
-def _infer_encoding(p: Path) -> str:
-    with open(p, 'rb') as f:
-        raw = f.read(100000)
-    guess = chardet.detect(raw)
+
+def _engine() -> str:
+    if PARSER_ENGINE == "arrow" and arrow_parser.AVAILABLE:
+        return "arrow"
+    return "pandas"
+
+
+def file_stat(p: Path) -> Dict[str, Any]:
+    st = p.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def file_fingerprint(p: Path) -> Dict[str, Any]:
+    """Size, mtime and BLAKE2b content hash of a file, read in 1 MB chunks."""
+    # Stat first: a write racing with the hash then shows up as a changed
+    # mtime on the next check rather than being masked.
+    fp = file_stat(p)
+    h = hashlib.blake2b(digest_size=32)
+    with open(p, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    fp["blake2b"] = h.hexdigest()
+    return fp
+
+
+@lru_cache(maxsize=1024)
+def _detect_encoding(path: str, mtime_ns: int, size: int) -> str:
+    with open(path, 'rb') as f:
+        raw = f.read(ENCODING_SAMPLE)
+    for bom, enc in _BOMS:
+        if raw.startswith(bom):
+            return enc
+    # NULs decode as UTF-8 but mark UTF-16/32 without a BOM; leave those to chardet
+    if b"\x00" not in raw:
+        try:
+            # final=False tolerates a multi-byte character cut off by the sample
+            codecs.getincrementaldecoder("utf-8")().decode(raw, final=len(raw) == size)
+            return "utf-8"
+        except UnicodeDecodeError:
+            pass
+    guess = chardet.detect(raw[:CHARDET_SAMPLE])
     return guess.get("encoding") or "utf-8"
 
 
+def _infer_encoding(p: Path) -> str:
+    """
+    Encoding of a file: BOM, else UTF-8 if the head decodes strictly and
+    has no NUL bytes, else chardet. Cached per (path, mtime, size), so repeated parses of an
+    unchanged file don't re-read it.
+    """
+    st = p.stat()
+    return _detect_encoding(str(p), st.st_mtime_ns, st.st_size)
+
+
 def _read_tabular(p: Path) -> pd.DataFrame:
     ext = p.suffix.lower()
     if ext == ".csv":
         enc = _infer_encoding(p)
-        return pd.read_csv(p, nrows=5000, encoding=enc)
+        return pd.read_csv(p, nrows=SAMPLE_ROWS, encoding=enc)
     if ext in {".xlsx", ".xls"}:
-        return pd.read_excel(p, nrows=5000)
+        return pd.read_excel(p, nrows=SAMPLE_ROWS)
     if ext == ".json":
+        enc = _infer_encoding(p)
         try:
-            with open(p, 'r', encoding=_infer_encoding(p)) as f:
+            with open(p, 'r', encoding=enc) as f:
                 first = f.read(1)
                 f.seek(0)
                 if first == '[':
                     return pd.json_normalize(json.load(f))
                 else:
-                    return pd.read_json(p, lines=True)
+                    return pd.read_json(p, lines=True, encoding=enc)
         except Exception:
-            return pd.read_json(p)
+            return pd.read_json(p, encoding=enc)
     raise ValueError(f"Unsupported extension: {ext}")
 
-def _read_text(p: Path) -> str:
+def _open_text(p: Path):
+    # The encoding is guessed from the head of the file; don't let a stray
+    # byte deep inside a large log abort the whole read
+    return open(p, "r", encoding=_infer_encoding(p), errors="replace")
+
+
+def _cut_point(buf: str, limit: int) -> int:
+    """Split position in buf[:limit], preferring paragraph, then line, then word breaks."""
+    floor = limit // 2
+    for sep in ("\n\n", "\n", " "):
+        i = buf.rfind(sep, floor, limit)
+        if i != -1:
+            return i + len(sep)
+    return limit
+
+
+def iter_text_chunks(p: Path, chunk_chars: int = CHUNK_CHARS,
+                     overlap: int = CHUNK_OVERLAP) -> Iterator[Dict[str, Any]]:
+    """
+    Stream a text file as overlapping chunks of at most `chunk_chars`
+    characters. Yields {"index", "start", "end", "text"} where start/end are
+    character offsets into the decoded file; consecutive chunks share about
+    `overlap` characters, starting on a word boundary where possible.
+    """
+    # Cuts land past chunk_chars // 2, so this keeps every step >= chunk_chars // 4
+    overlap = max(0, min(overlap, chunk_chars // 4))
+    index = 0
+    buf = ""
+    buf_start = 0
+    emitted_end = 0
+    eof = False
+    with _open_text(p) as f:
+        while True:
+            while not eof and len(buf) < chunk_chars:
+                block = f.read(READ_CHARS)
+                eof = not block
+                buf += block
+            if not buf or (eof and buf_start + len(buf) <= emitted_end):
+                return
+
+            cut = len(buf) if eof and len(buf) <= chunk_chars else _cut_point(buf, chunk_chars)
+            text = buf[:cut]
+            if text.strip():
+                yield {"index": index, "start": buf_start, "end": buf_start + cut, "text": text}
+                index += 1
+            emitted_end = buf_start + cut
+            if eof and cut == len(buf):
+                return
+
+            # Back up by `overlap`, then forward to the next word start
+            nxt = cut - overlap
+            space = buf.find(" ", nxt, cut)
+            nxt = space + 1 if overlap and space != -1 else nxt
+            nxt = max(nxt, 1)
+            buf = buf[nxt:]
+            buf_start += nxt
+
+
+def _text_summary(p: Path) -> Dict[str, Any]:
+    n_chars = 0
+    preview = ""
+    with _open_text(p) as f:
+        for block in iter(lambda: f.read(READ_CHARS), ""):
+            if len(preview) < PREVIEW_CHARS:
+                preview += block[:PREVIEW_CHARS - len(preview)]
+            n_chars += len(block)
+    return {"n_chars": n_chars, "preview": preview}
+
+
+def _summarize_arrow(p: Path) -> Optional[Dict[str, Any]]:
+    """
+    Summary via Arrow for CSV and JSON-lines files, or None when the file
+    needs the pandas path (a top-level JSON array, or Arrow can't parse it).
+    """
+    ext = p.suffix.lower()
+    try:
+        if ext == ".csv":
+            table = arrow_parser.read_csv(p, encoding=_infer_encoding(p), max_rows=SAMPLE_ROWS)
+        elif ext == ".json":
+            with open(p, "rb") as f:
+                if f.read(1) == b"[":
+                    return None
+            table = arrow_parser.read_json_lines(p)
+        else:
+            return None
+    except Exception as e:
+        logger.warning("Arrow could not parse %s (%s); using pandas", p, e)
+        return None
+    return arrow_parser.summarize_table(table)
+
+
+def _profile_csv(p: Path, engine: str) -> Dict[str, Any]:
     enc = _infer_encoding(p)
-    with open(p, "r", encoding=enc) as f:
-        return f.read()
+    if engine == "arrow":
+        try:
+            return column_profile.profile_csv(p, encoding=enc, engine="arrow")
+        except Exception as e:
+            # Arrow fixes column types from the first block; a later
+            # conflicting value aborts the pass
+            logger.warning("Arrow could not profile %s (%s); using pandas", p, e)
+    return column_profile.profile_csv(p, encoding=enc)
 
 
 def _summarize_dataframe(df: pd.DataFrame) -> Dict[str, Any]:
@@ -70,12 +247,29 @@ def _summarize_dataframe(df: pd.DataFrame) -> Dict[str, Any]:
     return summary
 
 
-def extract_context(path: Path) -> Dict[str, Any]:
+def extract_context(path: Path, full_profile: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Summarize a file for indexing. `full_profile` (default FULL_PROFILE)
+    profiles a CSV end to end with column_profile.profile_csv instead of
+    summarizing its first SAMPLE_ROWS rows.
+    """
     ext = path.suffix.lower()
+    if full_profile is None:
+        full_profile = FULL_PROFILE
+
+    engine = _engine()
+    summary = None
+    if ext == ".csv" and full_profile:
+        summary = _profile_csv(path, engine)
+    elif ext in {".csv", ".json", ".xlsx", ".xls"}:
+        summary = _summarize_arrow(path) if engine == "arrow" else None
+        if summary is None:
+            summary = _summarize_dataframe(_read_tabular(path))
+        # CSV and Excel reads stop at SAMPLE_ROWS, so n_rows may undercount
+        truncated = ext != ".json" and summary["n_rows"] >= SAMPLE_ROWS
+        summary["profile"] = "sample" if truncated else "full"
 
     if ext in {".csv", ".json", ".xlsx", ".xls"}:
-        df = _read_tabular(path)
-        summary = _summarize_dataframe(df)
         schema_lines = [
             f"{c['name']} ({c['dtype']}), nulls={c['nulls']}, unique={c['unique']} example={c['example']}"
             for c in summary["columns"]
@@ -85,27 +279,42 @@ def extract_context(path: Path) -> Dict[str, Any]:
             "type": "tabular",
             "path": str(path),
             "summary": summary,
-            "embed_text": f"Table with {summary['n_rows']} rows and {summary['n_cols']} columns.\n" + schema_text,
+            "embed_text": (
+                f"Table with {summary['n_rows']}{'+' if summary['profile'] == 'sample' else ''} rows "
+                f"and {summary['n_cols']} columns.\n" + schema_text
+            ),
         }
 
     elif ext == ".txt":
-        text = _read_text(path)
-
-        # Optional: trim text if extremely large
-        MAX_CHARS = 8000  # safeguard limit
-        embed_text = text[:MAX_CHARS]
+        # Streamed: only the preview and the first chunk are held in memory.
+        # Indexing re-reads the file through iter_text_chunks.
+        summary = _text_summary(path)
+        first = next(iter_text_chunks(path), None)
 
         content = {
             "type": "text",
             "path": str(path),
-            "summary": {
-                "n_chars": len(text),
-                "preview": text[:200]
-            },
-            "embed_text": f"Document notes:\n{embed_text}"
+            "summary": summary,
+            "embed_text": f"Document notes:\n{first['text'] if first else ''}"
         }
 
     else:
         raise ValueError(f"File type {ext} not supported. Supported: {sorted(SUPPORTED)}")
 
     return content
+
+
+def extract_if_changed(p: Path, old: Optional[Dict[str, Any]] = None,
+                       full_profile: Optional[bool] = None) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """
+    The file's current fingerprint and its `extract_context` (with a
+    "fingerprint" entry), or None for the context when the BLAKE2b hash
+    matches the `old` fingerprint. Module-level so it can run on a process
+    pool.
+    """
+    fingerprint = file_fingerprint(p)
+    if old and old.get("blake2b") == fingerprint["blake2b"]:
+        return fingerprint, None
+    ctx = extract_context(p, full_profile=full_profile)
+    ctx["fingerprint"] = fingerprint
+    return fingerprint, ctx
@@ -1,34 +1,139 @@
 from __future__ import annotations
-from typing import List, Dict, Any
-from app.services.embedding_service import embed_texts
+import os
+import asyncio
+from itertools import islice
+from pathlib import Path
+from typing import List, Dict, Any, AsyncIterator, Iterator, Optional, Tuple
+from app.services import parser_service
+from app.services.embedding_service import embed_texts, embed_texts_async
 from app.vectorstore import tiny_store
 from app.utils import llama_client
 
+# Text chunks embedded and written to the store per batch
+INDEX_BATCH_CHUNKS = int(os.getenv("INDEX_BATCH_CHUNKS", "256"))
+
 SYSTEM_PROMPT = """
 You are a helpful data assistant. Use the provided CONTEXT to answer faithfully.
 If the context is insufficient, say you don't have enough information.
 """
 
 
-def index_context(ctx: Dict[str, Any]):
-    path = ctx.get("path")
-    if tiny_store.already_indexed(path):
-        return {"indexed": False, "reason": "already exists"}
+def _unchanged(stored: List[Dict[str, Any]], fingerprint: Dict[str, Any]) -> bool:
+    old = stored[0].get("fingerprint") if stored else None
+    return bool(old) and old.get("blake2b") == fingerprint.get("blake2b")
 
-    texts = [ctx["embed_text"]]
-    vecs = embed_texts(texts)
-    tiny_store.add(vecs, [{
-        "path": ctx.get("path"),
+
+def index_rows(ctx: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    (text to embed, metadata) for each store row of a parsed file. Text
+    documents get one row per chunk, streamed from disk; everything else,
+    including empty text files, is a single row.
+    """
+    path = ctx.get("path")
+    base = {
+        "path": path,
         "type": ctx.get("type"),
         "summary": ctx.get("summary"),
-        "embed_text": ctx.get("embed_text")
-    }])
-    return {"indexed": True}
+        "fingerprint": ctx.get("fingerprint"),
+    }
+    if ctx.get("type") == "text" and path and Path(path).is_file():
+        chunked = False
+        for c in parser_service.iter_text_chunks(Path(path)):
+            chunked = True
+            yield c["text"], {**base, "embed_text": c["text"],
+                              "chunk": {"index": c["index"], "start": c["start"], "end": c["end"]}}
+        if chunked:
+            return
+    yield ctx["embed_text"], {**base, "embed_text": ctx.get("embed_text")}
 
-def answer(query: str, top_k: int = 4) -> Dict[str, Any]:
-    qvec = embed_texts([query])[0]
-    hits = tiny_store.search(qvec, top_k=top_k)
 
+def index_context(ctx: Dict[str, Any], force: bool = False):
+    """
+    Embed and store a parsed file, INDEX_BATCH_CHUNKS rows at a time so
+    memory stays bounded for large documents. The first batch replaces any
+    rows from a previous version of the file.
+    """
+    path = ctx.get("path")
+    if ctx.get("fingerprint") is None and path and Path(path).is_file():
+        ctx = {**ctx, "fingerprint": parser_service.file_fingerprint(Path(path))}
+    fingerprint = ctx.get("fingerprint")
+
+    stored = tiny_store.get_metadata(path)
+    if stored and not force and (fingerprint is None or _unchanged(stored, fingerprint)):
+        return {"indexed": False, "reason": "already exists"}
+
+    rows = index_rows(ctx)
+    n = 0
+    while True:
+        batch = list(islice(rows, INDEX_BATCH_CHUNKS))
+        if not batch:
+            break
+        vecs = embed_texts([text for text, _ in batch])
+        metas = [meta for _, meta in batch]
+        if n == 0 and stored:
+            # Content changed: swap this file's rows in place
+            tiny_store.replace(path, vecs, metas)
+        else:
+            tiny_store.add(vecs, metas, dedup=n == 0)
+        n += len(batch)
+
+    result: Dict[str, Any] = {"indexed": True}
+    if ctx.get("type") == "text":
+        result["chunks"] = n
+    if stored:
+        result["replaced"] = True
+    return result
+
+
+def reusable_fingerprint(stored: List[Dict[str, Any]], full_profile: Optional[bool] = None) -> Optional[Dict[str, Any]]:
+    """
+    Fingerprint of the indexed version of a file, or None when it must be
+    re-indexed regardless: never indexed, or indexed from a sample when a
+    full profile is asked for.
+    """
+    if not stored:
+        return None
+    if full_profile and (stored[0].get("summary") or {}).get("profile") == "sample":
+        return None
+    return stored[0].get("fingerprint")
+
+
+def stat_unchanged(p: Path, old: Optional[Dict[str, Any]]) -> bool:
+    return bool(old) and {k: old.get(k) for k in ("size", "mtime_ns")} == parser_service.file_stat(p)
+
+
+def refreshed_fingerprints(fingerprints: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    tiny_store.update_metadata updates recording the new size/mtime of files
+    whose content hash matched, so their next check is a stat again rather
+    than a full re-hash.
+    """
+    return {path: {"fingerprint": fp} for path, fp in fingerprints.items()}
+
+
+def index_path(p: Path, full_profile: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Parse and index a file, skipping the work when it is unchanged since it
+    was last indexed: matching size and mtime skip even the hash, and a
+    matching BLAKE2b hash skips parsing and embedding (and records the new
+    mtime). Asking for a full profile of a file indexed from a sample
+    re-indexes it.
+    """
+    stored = tiny_store.get_metadata(str(p))
+    old = reusable_fingerprint(stored, full_profile)
+    if stat_unchanged(p, old):
+        return {"indexed": False, "reason": "unchanged", "summary": stored[0].get("summary")}
+
+    fingerprint, ctx = parser_service.extract_if_changed(p, old, full_profile)
+    if ctx is None:
+        tiny_store.update_metadata(refreshed_fingerprints({str(p): fingerprint}))
+        return {"indexed": False, "reason": "unchanged", "summary": stored[0].get("summary")}
+
+    result = index_context(ctx, force=True)
+    result["summary"] = ctx.get("summary")
+    return result
+
+def _build_messages(query: str, hits: List[Dict[str, Any]]) -> List[Dict[str, str]]:
     # Build context string from top matches
     ctx_sources = []
     for h in hits:
@@ -37,7 +142,10 @@ def answer(query: str, top_k: int = 4) -> Dict[str, Any]:
         text = h.get("embed_text") if h.get("embed_text") else None
 
         # Try pulling full text or fallback to summary preview
-        if text:
+        chunk = h.get("chunk")
+        if text and chunk:
+            ctx_sources.append(f"From file {h.get('path')} (chars {chunk['start']}-{chunk['end']}):\n{text}")
+        elif text:
             ctx_sources.append(f"From file {h.get('path')}:\n{text}")
         else:
             ctx_sources.append(f"From file {h.get('path')}:\n{h.get('summary')}")
@@ -61,5 +169,35 @@ def answer(query: str, top_k: int = 4) -> Dict[str, Any]:
             ),
         },
     ]
-    completion = llama_client.chat(messages)
+    return messages
+
+
+def answer(query: str, top_k: int = 4) -> Dict[str, Any]:
+    qvec = embed_texts([query])[0]
+    hits = tiny_store.search(qvec, top_k=top_k)
+    completion = llama_client.chat(_build_messages(query, hits))
     return {"answer": completion, "context_used": hits}
+
+
+async def _retrieve_async(query: str, top_k: int) -> List[Dict[str, Any]]:
+    qvec = (await embed_texts_async([query]))[0]
+    # Scoring is numpy work that releases the GIL; keep it off the event loop
+    return await asyncio.to_thread(tiny_store.search, qvec, top_k)
+
+
+async def answer_async(query: str, top_k: int = 4) -> Dict[str, Any]:
+    hits = await _retrieve_async(query, top_k)
+    completion = await llama_client.chat_async(_build_messages(query, hits))
+    return {"answer": completion, "context_used": hits}
+
+
+async def answer_stream(query: str, top_k: int = 4) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Yield ("context", hits) as soon as retrieval finishes, then ("token", text)
+    for each piece of the completion, then ("done", None).
+    """
+    hits = await _retrieve_async(query, top_k)
+    yield "context", hits
+    async for token in llama_client.chat_stream(_build_messages(query, hits)):
+        yield "token", token
+    yield "done", None
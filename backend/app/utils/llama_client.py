@@ -1,9 +1,66 @@
 from __future__ import annotations
 import os
-from typing import List, Dict
+import asyncio
+from typing import List, Dict, Optional, AsyncIterator
+import importlib.util
+from pathlib import Path
+from types import ModuleType
+import httpx
 import ollama
 
+# Response cache shared with the Streamlit app and main.py. Loaded by file
+# location: putting the repo root on sys.path would let its app.py shadow
+# this `app` package (in spawned workers too).
+LLM_CACHE_MODULE = Path(os.getenv("LLM_CACHE_MODULE", Path(__file__).resolve().parents[3] / "llm_cache.py"))
+
+
+def _load_llm_cache() -> Optional[ModuleType]:
+    if not LLM_CACHE_MODULE.is_file():
+        return None
+    spec = importlib.util.spec_from_file_location("llm_cache", LLM_CACHE_MODULE)
+    module = importlib.util.module_from_spec(spec)  # type: ignore
+    spec.loader.exec_module(module)  # type: ignore
+    return module
+
+
+llm_cache = _load_llm_cache()
+
 LLM_MODEL = os.getenv("LLM_MODEL", "llama3.1:8b")
+OLLAMA_HOST = os.getenv("OLLAMA_HOST")
+# Requests allowed in flight per model, so bursts queue here instead of
+# piling onto the local model server
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "2"))
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "32"))
+
+_async_client: Optional[ollama.AsyncClient] = None
+_slots: Dict[str, asyncio.Semaphore] = {}
+
+
+def async_client() -> ollama.AsyncClient:
+    """Process-wide AsyncClient; its httpx pool keeps connections alive between requests."""
+    global _async_client
+    if _async_client is None:
+        _async_client = ollama.AsyncClient(
+            host=OLLAMA_HOST,
+            limits=httpx.Limits(max_connections=OLLAMA_MAX_CONNECTIONS,
+                                max_keepalive_connections=OLLAMA_MAX_CONNECTIONS),
+        )
+    return _async_client
+
+
+def model_slot(model: str, limit: int) -> asyncio.Semaphore:
+    """Semaphore bounding concurrent requests to one model."""
+    slot = _slots.get(model)
+    if slot is None:
+        slot = _slots[model] = asyncio.Semaphore(limit)
+    return slot
+
+
+async def aclose():
+    global _async_client
+    if _async_client is not None:
+        await _async_client._client.aclose()
+        _async_client = None
 
 
 def chat(messages: List[Dict[str, str]]) -> str:
@@ -13,5 +70,36 @@ def chat(messages: List[Dict[str, str]]) -> str:
       {"role": "user", "content": "..."}
     ]
     """
+    if llm_cache is not None:
+        cached = llm_cache.get(LLM_MODEL, messages)
+        if cached is not None:
+            return cached
     resp = ollama.chat(model=LLM_MODEL, messages=messages)
-    return resp["message"]["content"]  # type: ignore
+    content = resp["message"]["content"]  # type: ignore
+    if llm_cache is not None:
+        llm_cache.put(LLM_MODEL, messages, content)
+    return content
+
+
+async def chat_async(messages: List[Dict[str, str]]) -> str:
+    """Async `chat` over the shared client, limited to LLM_CONCURRENCY in flight."""
+    if llm_cache is not None:
+        cached = await asyncio.to_thread(llm_cache.get, LLM_MODEL, messages)
+        if cached is not None:
+            return cached
+    async with model_slot(LLM_MODEL, LLM_CONCURRENCY):
+        resp = await async_client().chat(model=LLM_MODEL, messages=messages)
+    content = resp["message"]["content"]  # type: ignore
+    if llm_cache is not None:
+        await asyncio.to_thread(llm_cache.put, LLM_MODEL, messages, content)
+    return content
+
+
+async def chat_stream(messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+    """Yield completion text as the model generates it. Holds a model slot until done."""
+    async with model_slot(LLM_MODEL, LLM_CONCURRENCY):
+        stream = await async_client().chat(model=LLM_MODEL, messages=messages, stream=True)
+        async for part in stream:
+            token = part["message"]["content"]  # type: ignore
+            if token:
+                yield token
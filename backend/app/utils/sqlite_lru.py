@@ -0,0 +1,77 @@
+from __future__ import annotations
+import sqlite3
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+# Standard library only: the root llm_cache.py loads this file by location,
+# outside the `app` package
+
+
+class SQLiteLRU:
+    """
+    A SQLite table shared by every process on the host, bounded by size.
+
+    Rows carry `key`, `nbytes` and `last_used` columns next to whatever the
+    cache stores. Callers refresh `last_used` on hits and call `evict` after
+    inserts to drop the least recently used rows down to 90% of `max_bytes`.
+    Callers serialise access to one instance themselves.
+    """
+
+    def __init__(self, path: Path, table: str, columns: str, max_bytes: int):
+        self.path = path
+        self.table = table
+        self.columns = columns
+        self.max_bytes = max_bytes
+        self._db: Optional[sqlite3.Connection] = None
+
+    def conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(f"CREATE TABLE IF NOT EXISTS {self.table} ({self.columns})")
+            db.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_last_used ON {self.table}(last_used)")
+            self._db = db
+        return self._db
+
+    def touch(self, keys: Iterable[str], now: float):
+        db = self.conn()
+        db.executemany(f"UPDATE {self.table} SET last_used=? WHERE key=?", [(now, k) for k in keys])
+        db.commit()
+
+    def evict(self) -> List[str]:
+        """Drop least recently used rows once the table outgrows max_bytes; returns their keys."""
+        db = self.conn()
+        total = self.size()[1]
+        if total <= self.max_bytes:
+            return []
+        target = int(self.max_bytes * 0.9)
+        freed = 0
+        victims = []
+        for k, nbytes in db.execute(f"SELECT key, nbytes FROM {self.table} ORDER BY last_used"):
+            victims.append(k)
+            freed += nbytes
+            if total - freed <= target:
+                break
+        db.executemany(f"DELETE FROM {self.table} WHERE key=?", [(k,) for k in victims])
+        db.commit()
+        return victims
+
+    def size(self) -> Tuple[int, int]:
+        """(rows, bytes) currently on disk."""
+        return self.conn().execute(f"SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM {self.table}").fetchone()
+
+    def clear(self):
+        db = self.conn()
+        db.execute(f"DELETE FROM {self.table}")
+        db.commit()
+
+    def close(self):
+        """Drop the connection, discarding any uncommitted work; the next call reconnects."""
+        if self._db is not None:
+            try:
+                self._db.close()
+            except sqlite3.Error:
+                pass
+            self._db = None
@@ -0,0 +1,95 @@
+from __future__ import annotations
+import os
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, TypeVar
+
+# Processes for CPU-bound parsing/profiling; 0 runs jobs on threads instead
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+T = TypeVar("T")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_threads: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def process_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Shared process pool, started on first use. Workers are spawned rather
+    than forked: the server process holds threads (httpx, SQLite, the
+    embedding pool) whose locks a fork could copy mid-acquire.
+    """
+    global _pool
+    if PARSE_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def cpu_executor() -> Executor:
+    """The process pool, or a shared thread pool when PARSE_WORKERS is 0."""
+    global _threads
+    pool = process_pool()
+    if pool is not None:
+        return pool
+    with _pool_lock:
+        if _threads is None:
+            _threads = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="parse")
+        return _threads
+
+
+def _discard(pool: Executor):
+    """Forget `pool` if it is still the shared one, so the next call starts a fresh pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _discard_if_broken(pool: Executor, fut: Future):
+    if not fut.cancelled() and isinstance(fut.exception(), BrokenProcessPool):
+        _discard(pool)
+
+
+def submit(fn: Callable[..., T], *args: Any) -> "Future[T]":
+    """
+    Submit `fn(*args)` to cpu_executor(). A worker that dies (OOM-killed on
+    a huge file, say) breaks a ProcessPoolExecutor for good: the jobs it
+    held fail with BrokenProcessPool and the pool is replaced, so later
+    jobs run on a fresh one.
+    """
+    pool = cpu_executor()
+    try:
+        fut = pool.submit(fn, *args)
+    except BrokenProcessPool:
+        _discard(pool)
+        pool = cpu_executor()
+        fut = pool.submit(fn, *args)
+    if isinstance(pool, ProcessPoolExecutor):
+        fut.add_done_callback(lambda f: _discard_if_broken(pool, f))
+    return fut
+
+
+async def run_cpu(fn: Callable[..., T], *args: Any) -> T:
+    """
+    Await `fn(*args)` on the process pool so CPU-bound work neither blocks
+    the event loop nor holds the GIL. `fn` and its arguments must pickle.
+    """
+    return await asyncio.wrap_future(submit(fn, *args))
+
+
+def shutdown():
+    global _pool, _threads
+    with _pool_lock:
+        for pool in (_pool, _threads):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        _pool = _threads = None
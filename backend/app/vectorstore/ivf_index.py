@@ -0,0 +1,106 @@
+from __future__ import annotations
+import os
+from pathlib import Path
+from typing import Iterable
+import numpy as np
+
+
+def normalize(x: np.ndarray) -> np.ndarray:
+    """L2-normalize the last axis as float32; zero vectors are left as zeros."""
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def train_centroids(sample: np.ndarray, nlist: int, iters: int = 20, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means over `sample` (rows are compared by cosine similarity).
+    Returns an (nlist, dim) float32 matrix of unit-length centroids.
+    """
+    rng = np.random.default_rng(seed)
+    x = normalize(sample)
+    nlist = max(1, min(nlist, x.shape[0]))
+    centroids = x[rng.choice(x.shape[0], nlist, replace=False)].copy()
+    for _ in range(iters):
+        labels = np.argmax(x @ centroids.T, axis=1)
+        counts = np.bincount(labels, minlength=nlist)
+        order = np.argsort(labels, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        sums = np.zeros_like(centroids)
+        nonempty = counts > 0
+        sums[nonempty] = np.add.reduceat(x[order], starts[nonempty], axis=0)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty lists with random sample rows
+            sums[empty] = x[rng.choice(x.shape[0], int(empty.sum()))]
+        centroids = normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file index with a k-means coarse quantizer.
+
+    Every row id is filed under its nearest centroid. A query scores the
+    centroids, then only the rows in the `nprobe` closest lists, so a larger
+    `nprobe` trades latency for recall. Row ids are global store rows; the
+    index covers rows [0, rows) and anything appended later is scanned
+    exactly by the caller.
+    """
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, row_ids: np.ndarray, rows: int):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.row_ids = row_ids
+        self.rows = rows
+
+    @property
+    def nlist(self) -> int:
+        return self.centroids.shape[0]
+
+    @classmethod
+    def build(cls, sample: np.ndarray, blocks: Iterable[np.ndarray], rows: int, nlist: int) -> "IVFIndex":
+        """Train on `sample`, then assign every row streamed from `blocks`."""
+        centroids = train_centroids(sample, nlist)
+        labels = np.concatenate([np.argmax(normalize(b) @ centroids.T, axis=1) for b in blocks]) \
+            if rows else np.zeros(0, dtype=np.int64)
+        row_ids = np.argsort(labels, kind="stable").astype(np.int64)
+        counts = np.bincount(labels, minlength=centroids.shape[0])
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(centroids, offsets, row_ids, rows)
+
+    def probe(self, query_vec: np.ndarray, nprobe: int) -> np.ndarray:
+        """Row ids filed under the `nprobe` centroids closest to the query."""
+        q = normalize(query_vec.reshape(-1))
+        nprobe = max(1, min(nprobe, self.nlist))
+        scores = self.centroids @ q
+        lists = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        return np.concatenate([self.row_ids[self.offsets[i]:self.offsets[i + 1]] for i in lists])
+
+    def remap(self, new_ids: np.ndarray) -> "IVFIndex":
+        """
+        Renumber rows after compaction dropped some: `new_ids[old_row]` is the
+        new row id, or -1 for a dropped row. Row order must be preserved.
+        """
+        labels = np.repeat(np.arange(self.nlist), np.diff(self.offsets))
+        ids = new_ids[self.row_ids]
+        keep = ids >= 0
+        counts = np.bincount(labels[keep], minlength=self.nlist)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        rows = int((new_ids[:self.rows] >= 0).sum())
+        return IVFIndex(self.centroids, offsets, ids[keep].astype(np.int64), rows)
+
+    def save(self, path: Path):
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, centroids=self.centroids, offsets=self.offsets,
+                     row_ids=self.row_ids, rows=np.int64(self.rows))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "IVFIndex":
+        with np.load(path) as z:
+            return cls(z["centroids"], z["offsets"], z["row_ids"], int(z["rows"]))
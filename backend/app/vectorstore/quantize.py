@@ -0,0 +1,58 @@
+from __future__ import annotations
+from typing import Optional, Tuple
+import numpy as np
+
+DTYPES = ("float32", "float16", "int8")
+
+
+def quantize(vecs: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Encode float32 rows for storage. int8 uses symmetric scalar quantization
+    with one float32 scale per row (max |x| / 127); the other dtypes need no
+    scale and return None for it.
+    """
+    vecs = np.asarray(vecs, dtype=np.float32)
+    if dtype == "float32":
+        return vecs, None
+    if dtype == "float16":
+        return vecs.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(vecs).max(axis=1) / 127.0 if vecs.size else np.zeros(vecs.shape[0], dtype=np.float32)
+        scales = scales.astype(np.float32)
+        safe = np.where(scales == 0, 1.0, scales)
+        codes = np.clip(np.rint(vecs / safe[:, None]), -127, 127).astype(np.int8)
+        return codes, scales
+    raise ValueError(f"Unsupported storage dtype: {dtype}. Supported: {DTYPES}")
+
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    vecs = codes.astype(np.float32)
+    if scales is not None:
+        vecs *= scales[:, None]
+    return vecs
+
+
+def scores(codes: np.ndarray, scales: Optional[np.ndarray], queries: np.ndarray) -> np.ndarray:
+    """(rows, m) dot products of stored rows against float32 queries (m, dim)."""
+    out = codes.astype(np.float32, copy=False) @ queries.T
+    if scales is not None:
+        out *= scales[:, None]
+    return out
+
+
+def quantization_recall(vectors: np.ndarray, queries: np.ndarray, dtype: str, top_k: int = 4) -> float:
+    """
+    Recall@k of search over `dtype`-quantized copies of unit-length `vectors`
+    against exact float32 search. Useful on a sample before opting a store
+    into a smaller dtype.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    k = min(top_k, vectors.shape[0])
+    if k == 0:
+        return 1.0
+    exact = np.argpartition(-(vectors @ queries.T), k - 1, axis=0)[:k]
+    codes, scales = quantize(vectors, dtype)
+    approx = np.argpartition(-scores(codes, scales, queries), k - 1, axis=0)[:k]
+    hits = sum(len(set(exact[:, j]) & set(approx[:, j])) for j in range(queries.shape[0]))
+    return hits / (k * queries.shape[0])
@@ -1,82 +1,984 @@
 from __future__ import annotations
 import os
 import json
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+from app.vectorstore.ivf_index import IVFIndex, normalize
+from app.vectorstore import quantize
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-writer only
+    fcntl = None
 
 STORE_DIR = Path("backend/data/vectorstore")
 STORE_DIR.mkdir(parents=True, exist_ok=True)
+SEGMENTS_DIR = STORE_DIR / "segments"
+MANIFEST_JSON = STORE_DIR / "manifest.json"
+LOCK_FILE = STORE_DIR / ".lock"
+
+# Legacy single-file layout, migrated on first open
 VECTORS_NPZ = STORE_DIR / "vectors.npz"
 META_JSON = STORE_DIR / "meta.json"
 
+# Segments smaller than this are merged by compact(); once more than
+# MAX_SEGMENTS exist, add() compacts in a background thread.
+COMPACT_MIN_ROWS = int(os.getenv("TINY_STORE_COMPACT_MIN_ROWS", "4096"))
+MAX_SEGMENTS = int(os.getenv("TINY_STORE_MAX_SEGMENTS", "32"))
+# compact() also drops deleted rows once they make up this share of the store
+PURGE_RATIO = float(os.getenv("TINY_STORE_PURGE_RATIO", "0.2"))
+# Rows scored per step when streaming over the mapped segments
+SEARCH_BLOCK_ROWS = int(os.getenv("TINY_STORE_SEARCH_BLOCK_ROWS", "65536"))
+
+# Search backend: "exact" (brute force, the default) or "ivf" once an index
+# has been built with build_index(). NPROBE is the recall/latency knob.
+INDEX_BACKEND = os.getenv("TINY_STORE_INDEX", "exact")
+IVF_NPROBE = int(os.getenv("TINY_STORE_NPROBE", "8"))
+IVF_TRAIN_SAMPLE = int(os.getenv("TINY_STORE_IVF_TRAIN_SAMPLE", "50000"))
+
+# Storage precision for new stores: "float32", "float16" or "int8" (per-row
+# scale). KEEP_FULL also writes float32 copies of quantized segments; they
+# stay on disk and only the rows being re-ranked are paged in. RERANK > 0
+# re-scores the best RERANK * top_k quantized candidates at full precision.
+STORAGE_DTYPE = os.getenv("TINY_STORE_DTYPE", "float32")
+KEEP_FULL = os.getenv("TINY_STORE_KEEP_FULL", "0") == "1"
+RERANK = int(os.getenv("TINY_STORE_RERANK", "0"))
+# Manifest reloads attempted when a compaction in another process removes
+# files between reading the manifest and opening them
+LOAD_RETRIES = 5
+
+
+def _fsync_write(path: Path, data: bytes):
+    """Write bytes to a temp file, fsync it and atomically rename over `path`."""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _part_name(name: str, part: str) -> str:
+    """seg-000001.npy -> seg-000001.<part>.npy for the scale / full-precision files."""
+    return name[:-len(".npy")] + f".{part}.npy"
+
+
+def _save_npy(name: str, arr: np.ndarray):
+    # Uncompressed .npy: the header is padded to a 64-byte boundary, so the
+    # data can be memory-mapped and read without any decoding step.
+    SEGMENTS_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = SEGMENTS_DIR / (name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, np.ascontiguousarray(arr))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, SEGMENTS_DIR / name)
+
+
+class _Segment:
+    """Mapped arrays of one segment: stored codes, int8 scales, float32 copy."""
+
+    def __init__(self, codes: np.ndarray, scales: Optional[np.ndarray] = None,
+                 full: Optional[np.ndarray] = None):
+        self.codes = codes
+        self.scales = scales
+        self.full = codes if codes.dtype == np.float32 else full
+
+    @property
+    def rows(self) -> int:
+        return self.codes.shape[0]
+
+
+def _write_segment(name: str, seg: _Segment):
+    _save_npy(name, seg.codes)
+    if seg.scales is not None:
+        _save_npy(_part_name(name, "scale"), seg.scales)
+    if seg.full is not None and seg.full is not seg.codes:
+        _save_npy(_part_name(name, "f32"), seg.full)
+
+
+def _encode(vecs: np.ndarray, manifest: Dict[str, Any]) -> _Segment:
+    codes, scales = quantize.quantize(vecs, manifest.get("dtype", "float32"))
+    return _Segment(codes, scales, vecs if manifest.get("keep_full") else None)
+
+
+def _empty_manifest() -> Dict[str, Any]:
+    return {"generation": 0, "dim": None, "next_segment": 1, "segments": [],
+            "meta_file": "meta.jsonl", "meta_bytes": 0, "tomb_file": "tombstones.bin", "tomb_bytes": 0,
+            "patch_file": "patches.jsonl", "patch_bytes": 0,
+            "index": None, "normalized": True, "dtype": STORAGE_DTYPE,
+            "keep_full": KEEP_FULL and STORAGE_DTYPE != "float32"}
+
+
+def _open_segment(name: str, manifest: Dict[str, Any]) -> _Segment:
+    def load(n: str) -> np.ndarray:
+        return np.load(SEGMENTS_DIR / n, mmap_mode="r")
+    dtype = manifest.get("dtype", "float32")
+    return _Segment(
+        load(name),
+        load(_part_name(name, "scale")) if dtype == "int8" else None,
+        load(_part_name(name, "f32")) if manifest.get("keep_full") else None,
+    )
+
+
+def _concat_segments(segs: List[_Segment]) -> _Segment:
+    first = segs[0]
+    return _Segment(
+        np.concatenate([s.codes for s in segs]),
+        np.concatenate([s.scales for s in segs]) if first.scales is not None else None,
+        np.concatenate([s.full for s in segs]) if first.full is not None else None,
+    )
+
+
+def _segment_files(name: str) -> List[Path]:
+    return [SEGMENTS_DIR / n for n in (name, _part_name(name, "scale"), _part_name(name, "f32"))]
+
+
+def _unlink_quietly(path: Path):
+    try:
+        path.unlink(missing_ok=True)
+    except OSError:  # still mapped by this process on Windows
+        pass
+
+
+def _read_manifest() -> Dict[str, Any]:
+    if MANIFEST_JSON.exists():
+        return json.loads(MANIFEST_JSON.read_text())
+    return _empty_manifest()
+
+
+def _write_manifest(manifest: Dict[str, Any]):
+    _fsync_write(MANIFEST_JSON, json.dumps(manifest).encode("utf-8"))
+
+
+def _meta_file(manifest: Dict[str, Any]) -> str:
+    return manifest.get("meta_file", "meta.jsonl")
+
+
+def _tomb_file(manifest: Dict[str, Any]) -> str:
+    return manifest.get("tomb_file", "tombstones.bin")
+
+
+def _patch_file(manifest: Dict[str, Any]) -> str:
+    return manifest.get("patch_file", "patches.jsonl")
+
+
+def _read_log(name: str, start: int, end: int) -> bytes:
+    """Read the committed byte range [start, end) of an append-only log."""
+    if end <= start:
+        return b""
+    with open(STORE_DIR / name, "rb") as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+def _append_log(name: str, committed: int, data: bytes) -> int:
+    """Append after the committed offset of a log; returns the new offset."""
+    with open(STORE_DIR / name, "ab") as f:
+        # Drop any torn tail left behind by a writer that crashed before
+        # committing its manifest.
+        f.truncate(committed)
+        f.seek(committed)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return committed + len(data)
+
+
+def _read_meta(manifest: Dict[str, Any], start: int) -> List[Dict[str, Any]]:
+    data = _read_log(_meta_file(manifest), start, manifest["meta_bytes"])
+    return [json.loads(line) for line in data.splitlines() if line]
+
+
+def _encode_meta(metadatas: List[Dict[str, Any]]) -> bytes:
+    return b"".join(json.dumps(m).encode("utf-8") + b"\n" for m in metadatas)
+
+
+def _append_meta(manifest: Dict[str, Any], metadatas: List[Dict[str, Any]]) -> int:
+    return _append_log(_meta_file(manifest), manifest["meta_bytes"], _encode_meta(metadatas))
+
+
+def _read_tombstones(manifest: Dict[str, Any], start: int) -> np.ndarray:
+    """Row ids deleted since byte offset `start` of the tombstone log."""
+    data = _read_log(_tomb_file(manifest), start, manifest.get("tomb_bytes", 0))
+    return np.frombuffer(data, dtype=np.int64)
+
+
+def _append_tombstones(manifest: Dict[str, Any], rows: List[int]) -> int:
+    data = np.asarray(rows, dtype=np.int64).tobytes()
+    return _append_log(_tomb_file(manifest), manifest.get("tomb_bytes", 0), data)
+
+
+def _read_patches(manifest: Dict[str, Any], start: int) -> List[Dict[str, Any]]:
+    """Metadata updates ({"rows": [...], "set": {...}}) since byte offset `start` of the patch log."""
+    data = _read_log(_patch_file(manifest), start, manifest.get("patch_bytes", 0))
+    return [json.loads(line) for line in data.splitlines() if line]
+
+
+_lock_depth = threading.local()
+_thread_writer = threading.Lock()
+
+
+@contextmanager
+def _write_lock():
+    """
+    Serialise writers across threads and worker processes sharing the store
+    (re-entrant). Taken before a TinyStore's own lock, never inside it.
+    """
+    depth = getattr(_lock_depth, "n", 0)
+    if depth:
+        _lock_depth.n = depth + 1
+        try:
+            yield
+        finally:
+            _lock_depth.n = depth
+        return
+    with _thread_writer:
+        _lock_depth.n = 1
+        try:
+            if fcntl is None:
+                yield
+            else:
+                with open(LOCK_FILE, "a") as f:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                    try:
+                        yield
+                    finally:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        finally:
+            _lock_depth.n = 0
+
+
+def _migrate_legacy():
+    """Convert a vectors.npz/meta.json store into the segmented layout."""
+    if MANIFEST_JSON.exists() or not (VECTORS_NPZ.exists() and META_JSON.exists()):
+        return
+    vecs = np.load(VECTORS_NPZ)["arr"]
+    meta = json.loads(META_JSON.read_text())
+    manifest = _read_manifest()
+    if len(meta):
+        name = "seg-000001.npy"
+        _write_segment(name, _encode(normalize(vecs), manifest))
+        (STORE_DIR / _meta_file(manifest)).unlink(missing_ok=True)
+        manifest["meta_bytes"] = _append_meta(manifest, meta)
+        manifest.update(dim=int(vecs.shape[1]), next_segment=2,
+                        segments=[{"file": name, "rows": len(meta)}])
+    manifest["generation"] = 1
+    _write_manifest(manifest)
+    VECTORS_NPZ.unlink()
+    META_JSON.unlink()
+
+
+def _normalize_segments():
+    """Rewrite segments written before vectors were normalized at insert time."""
+    manifest = _read_manifest()
+    if manifest.get("normalized"):
+        return
+    segs = []
+    next_segment = manifest["next_segment"]
+    for s in manifest["segments"]:
+        name = f"seg-{next_segment:06d}.npy"
+        next_segment += 1
+        # Stores this old were always float32
+        _write_segment(name, _Segment(normalize(_open_segment(s["file"], manifest).codes)))
+        segs.append({"file": name, "rows": s["rows"]})
+    old = manifest["segments"]
+    manifest.update(generation=manifest["generation"] + 1, next_segment=next_segment,
+                    segments=segs, normalized=True, dtype="float32", keep_full=False)
+    _write_manifest(manifest)
+    for s in old:
+        _unlink_quietly(SEGMENTS_DIR / s["file"])
+
+
+def _upgrade_layout():
+    with _write_lock():
+        _migrate_legacy()
+        _normalize_segments()
+
+
+def _merge_top_k(best_ids: np.ndarray, best_scores: np.ndarray, ids: np.ndarray,
+                 scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Keep the k highest scores in each column of the stacked candidates."""
+    ids = np.concatenate([best_ids, ids])
+    scores = np.concatenate([best_scores, scores])
+    if scores.shape[0] > k:
+        part = np.argpartition(-scores, k - 1, axis=0)[:k]
+        ids = np.take_along_axis(ids, part, axis=0)
+        scores = np.take_along_axis(scores, part, axis=0)
+    return ids, scores
+
+
+def _sorted_top_k(ids: np.ndarray, scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Order (k, m) candidates best first and transpose to one row per query."""
+    order = np.argsort(-scores, axis=0, kind="stable")
+    return np.take_along_axis(ids, order, axis=0).T, np.take_along_axis(scores, order, axis=0).T
+
+
+class _View:
+    """
+    Snapshot of one store generation: mapped segments, index, metadata and the
+    tombstone mask. `paths` maps each path to its live row ids; it is shared
+    with later views and only read or updated under the store lock.
+    """
+
+    def __init__(self, segs: List[_Segment], index: Optional[IVFIndex], meta: List[Dict[str, Any]],
+                 deleted: np.ndarray, paths: Dict[Optional[str], List[int]]):
+        self.segs = segs
+        self.index = index
+        self.meta = meta
+        self.deleted = deleted
+        self.n_deleted = int(deleted.sum())
+        self.paths = paths
+        self.starts = np.concatenate([[0], np.cumsum([s.rows for s in segs])]).astype(np.int64)
 
-def _load() -> (np.ndarray, List[Dict[str, Any]]):
-    if VECTORS_NPZ.exists():
-        arr = np.load(VECTORS_NPZ)["arr"]
-    else:
-        arr = np.zeros((0, 768), dtype=np.float32)  # default dim placeholder
-    if META_JSON.exists():
-        meta = json.loads(META_JSON.read_text())
-    else:
-        meta = []
-    return arr, meta
+    @property
+    def live(self) -> int:
+        return len(self.meta) - self.n_deleted
 
+    @property
+    def quantized(self) -> bool:
+        return any(s.codes.dtype != np.float32 for s in self.segs)
 
-def _save(vecs: np.ndarray, meta: List[Dict[str, Any]]):
-    np.savez_compressed(VECTORS_NPZ, arr=vecs)
-    META_JSON.write_text(json.dumps(meta, indent=2))
+    @property
+    def has_full(self) -> bool:
+        return all(s.full is not None for s in self.segs)
 
+    def blocks(self, rows: int = SEARCH_BLOCK_ROWS):
+        """Yield (codes, scales) blocks of the stored rows in order."""
+        for seg in self.segs:
+            for start in range(0, seg.rows, rows):
+                yield (seg.codes[start:start + rows],
+                       None if seg.scales is None else seg.scales[start:start + rows])
 
-def add(vectors: np.ndarray, metadatas: List[Dict[str, Any]]):
-    assert vectors.shape[0] == len(metadatas)
-    cur, meta = _load()
+    def float_blocks(self, rows: int = SEARCH_BLOCK_ROWS):
+        """Yield stored rows as float32 blocks, from the full copies when present."""
+        for seg in self.segs:
+            for start in range(0, seg.rows, rows):
+                if seg.full is not None:
+                    yield seg.full[start:start + rows]
+                else:
+                    yield quantize.dequantize(seg.codes[start:start + rows],
+                                              None if seg.scales is None else seg.scales[start:start + rows])
 
-    new_vecs = []
-    new_meta = []
+    def gather(self, row_ids: np.ndarray, full: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Copy just the given global rows out of the mapped segments, as float32
+        (from the full-precision copies when `full` is set).
+        """
+        row_ids = np.sort(row_ids)
+        seg_of = np.searchsorted(self.starts, row_ids, side="right") - 1
+        parts = []
+        for i in np.unique(seg_of):
+            seg = self.segs[i]
+            local = row_ids[seg_of == i] - self.starts[i]
+            if full:
+                parts.append(np.asarray(seg.full[local], dtype=np.float32))
+            else:
+                parts.append(quantize.dequantize(seg.codes[local], None if seg.scales is None else seg.scales[local]))
+        return row_ids, np.concatenate(parts) if parts else np.zeros((0, 0), dtype=np.float32)
 
-    for vec, m in zip(vectors, metadatas):
-        if not any(entry.get("path") == m.get("path") for entry in meta):
-            new_vecs.append(vec)
-            new_meta.append(m)
+    def exact_top_k(self, queries: np.ndarray, top_k: int, full: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Brute-force top-k for a batch of unit-length queries: one GEMM per
+        block of stored rows, keeping only a running (k, m) candidate set.
+        """
+        m = queries.shape[0]
+        k = min(top_k, self.live)
+        if k <= 0:
+            return np.zeros((m, 0), dtype=np.int64), np.zeros((m, 0), dtype=np.float32)
+        best_ids = np.zeros((0, m), dtype=np.int64)
+        best_scores = np.zeros((0, m), dtype=np.float32)
+        offset = 0
+        # Bound the (rows, m) score block to roughly SEARCH_BLOCK_ROWS cells per query
+        rows = max(1024, SEARCH_BLOCK_ROWS // max(1, m))
+        blocks = ((b, None) for b in self.float_blocks(rows)) if full else self.blocks(rows)
+        for codes, scales in blocks:
+            scores = quantize.scores(codes, scales, queries)
+            if self.n_deleted:
+                scores[self.deleted[offset:offset + codes.shape[0]]] = -np.inf
+            ids = np.broadcast_to(np.arange(offset, offset + codes.shape[0], dtype=np.int64)[:, None], scores.shape)
+            best_ids, best_scores = _merge_top_k(best_ids, best_scores, ids, scores, k)
+            offset += codes.shape[0]
+        return _sorted_top_k(best_ids, best_scores)
 
-    if not new_vecs:
-        return  # nothing new to add
+    def rescore(self, candidates: np.ndarray, q: np.ndarray, top_k: int,
+                full: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """Score a candidate set of row ids against one query and keep the best `top_k`."""
+        rows, block = self.gather(candidates, full)
+        if not rows.size:
+            return rows, np.zeros(0, dtype=np.float32)
+        ids, scores = _sorted_top_k(*_merge_top_k(
+            np.zeros((0, 1), dtype=np.int64), np.zeros((0, 1), dtype=np.float32),
+            rows[:, None], (block @ q)[:, None], top_k))
+        return ids[0], scores[0]
 
-    new_vecs = np.array(new_vecs, dtype=np.float32)
+    def top_k(self, query_vec: np.ndarray, top_k: int, index: Optional[str] = None,
+              nprobe: Optional[int] = None, rerank: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Row ids and cosine scores of the best `top_k` rows, best first."""
+        q = normalize(np.asarray(query_vec).reshape(-1))
+        backend = index or INDEX_BACKEND
+        rerank = RERANK if rerank is None else rerank
+        if not (self.quantized and self.has_full):
+            rerank = 0
+        k = top_k * rerank if rerank else top_k
+        if backend == "ivf" and self.index is not None:
+            candidates = np.concatenate([
+                self.index.probe(q, nprobe or IVF_NPROBE),
+                np.arange(self.index.rows, len(self.meta), dtype=np.int64),  # added after the build
+            ])
+            candidates = candidates[~self.deleted[candidates]]
+            ids, scores = self.rescore(candidates, q, k)
+        elif backend in ("exact", "ivf"):
+            ids, scores = self.exact_top_k(q[None, :], k)
+            ids, scores = ids[0], scores[0]
+        else:
+            raise ValueError(f"Unknown index backend: {backend}")
+        if rerank:
+            return self.rescore(ids, q, top_k, full=True)
+        return ids, scores
 
-    if cur.size == 0:
-        updated_vecs = new_vecs
-    else:
-        updated_vecs = np.vstack([cur, new_vecs])
 
-    meta.extend(new_meta)
-    _save(updated_vecs, meta)
+class TinyStore:
+    """
+    Process-resident view of the on-disk store.
 
+    On disk the store is a list of immutable `.npy` vector segments, an
+    append-only metadata log (one JSON line per row), append-only logs of
+    deleted row ids and of metadata updates, and a `manifest.json` naming
+    the committed segments and log lengths. Writers add a new segment, append to the logs and then
+    atomically replace the manifest, so a crash at any point leaves the
+    previous generation intact.
 
+    A path -> live row ids index is built from the metadata and tombstone
+    logs as they are read, so dedup checks are O(1) and one path's rows can
+    be replaced or deleted without touching the rest of the store.
 
+    Vectors are L2-normalized once at insert time, so cosine similarity is a
+    plain dot product. Segments are opened read-only with `mmap_mode="r"` and
+    scored in blocks of SEARCH_BLOCK_ROWS, so vectors are never copied onto the heap and all
+    workers on a host share the OS page cache for the index. Every call stats
+    the manifest and, when another worker has committed a newer generation,
+    maps only the segments and reads only the metadata lines it has not seen.
+
+    A store can opt into float16 or int8 segments (TINY_STORE_DTYPE), fixed
+    in its manifest when it is first written; quantized rows are decoded one
+    block at a time while scoring.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._compacting = False
+        self._layout_checked = False
+        self._reset()
+
+    def _reset(self):
+        self._view = _View([], None, [], np.zeros(0, dtype=bool), {})
+        self._manifest = _empty_manifest()
+        self._stamp: Optional[Tuple] = ("unloaded",)
+
+    @staticmethod
+    def _disk_stamp() -> Optional[Tuple]:
+        try:
+            st = MANIFEST_JSON.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _ensure_layout(self):
+        """
+        Migrate an old on-disk layout, once per instance. It writes, so it runs
+        before self._lock is taken: the write lock always comes first.
+        """
+        if not self._layout_checked:
+            _upgrade_layout()
+            self._layout_checked = True
+
+    @contextmanager
+    def _writing(self):
+        """The write lock, then the store lock: the order every writer takes them in."""
+        with _write_lock():
+            self._ensure_layout()
+            with self._lock:
+                yield
+
+    def _snapshot(self) -> _View:
+        """The latest view, for reads that need nothing else under the lock."""
+        self._ensure_layout()
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self) -> _View:
+        stamp = self._disk_stamp()
+        if stamp == self._stamp:
+            return self._view
+        manifest = _read_manifest()
+        for attempt in range(LOAD_RETRIES):
+            if manifest["generation"] == self._manifest["generation"]:
+                break
+            try:
+                self._apply(manifest)
+                break
+            except FileNotFoundError:
+                # compact()/build_index() elsewhere committed a newer manifest
+                # and unlinked files the one we read still names
+                if attempt == LOAD_RETRIES - 1:
+                    raise
+                stamp = self._disk_stamp()
+                manifest = _read_manifest()
+        self._stamp = stamp
+        return self._view
+
+    def _apply(self, manifest: Dict[str, Any]):
+        old = self._manifest
+        known = old["segments"]
+        segs = manifest["segments"]
+        if (segs[:len(known)] == known
+                and _meta_file(manifest) == _meta_file(old) and manifest["meta_bytes"] >= old["meta_bytes"]
+                and _tomb_file(manifest) == _tomb_file(old)
+                and manifest.get("tomb_bytes", 0) >= old.get("tomb_bytes", 0)
+                and _patch_file(manifest) == _patch_file(old)
+                and manifest.get("patch_bytes", 0) >= old.get("patch_bytes", 0)):
+            # Only segments, metadata, tombstones and patches were appended: load just those.
+            new_segs = segs[len(known):]
+            meta_start = old["meta_bytes"]
+            tomb_start = old.get("tomb_bytes", 0)
+            patch_start = old.get("patch_bytes", 0)
+        else:
+            self._reset()
+            new_segs = segs
+            meta_start = 0
+            tomb_start = 0
+            patch_start = 0
+
+        # Every file is read before the view is touched, so a FileNotFoundError
+        # never leaves it half-applied
+        view = self._view
+        index = view.index
+        if manifest.get("index") != self._manifest.get("index"):
+            index = IVFIndex.load(STORE_DIR / manifest["index"]["file"]) if manifest.get("index") else None
+        new_meta = _read_meta(manifest, meta_start)
+        tombstones = _read_tombstones(manifest, tomb_start).tolist()
+        patches = _read_patches(manifest, patch_start)
+        opened = [_open_segment(s["file"], manifest) for s in new_segs]
+
+        meta = view.meta + new_meta
+        paths = view.paths
+        for row, m in enumerate(new_meta, start=len(view.meta)):
+            paths.setdefault(m.get("path"), []).append(row)
+        deleted = np.concatenate([view.deleted, np.zeros(len(new_meta), dtype=bool)])
+        for row in tombstones:
+            deleted[row] = True
+            rows = paths.get(meta[row].get("path"))
+            if rows and row in rows:
+                rows.remove(row)
+                if not rows:
+                    del paths[meta[row].get("path")]
+        # New dicts rather than updates in place: older views share the old ones
+        for patch in patches:
+            for row in patch["rows"]:
+                meta[row] = {**meta[row], **patch["set"]}
+
+        self._view = _View(
+            view.segs + opened,
+            index, meta, deleted, paths,
+        )
+        self._manifest = manifest
+
+    def _commit(self, manifest: Dict[str, Any]):
+        _write_manifest(manifest)
+        self._apply(manifest)
+        self._stamp = self._disk_stamp()
+
+    def _has_path(self, path: Optional[str]) -> bool:
+        return path in self._view.paths
+
+    def _write(self, vectors: Optional[np.ndarray], metadatas: List[Dict[str, Any]],
+               drop_rows: List[int]):
+        """Append rows and tombstone `drop_rows` in one committed generation."""
+        manifest = dict(self._manifest)
+        manifest["generation"] += 1
+        if drop_rows:
+            manifest["tomb_bytes"] = _append_tombstones(manifest, drop_rows)
+        if metadatas:
+            # Serialise first: metadata that isn't JSON fails before any file is written
+            meta_data = _encode_meta(metadatas)
+            vecs = normalize(np.asarray(vectors, dtype=np.float32))
+            name = f"seg-{manifest['next_segment']:06d}.npy"
+            _write_segment(name, _encode(vecs, manifest))
+            manifest.update(
+                dim=int(vecs.shape[1]),
+                next_segment=manifest["next_segment"] + 1,
+                segments=manifest["segments"] + [{"file": name, "rows": len(metadatas)}],
+                meta_bytes=_append_log(_meta_file(manifest), manifest["meta_bytes"], meta_data),
+            )
+        self._commit(manifest)
+
+        if len(manifest["segments"]) > MAX_SEGMENTS and not self._compacting:
+            self._compacting = True
+            threading.Thread(target=self._background_compact, daemon=True).start()
+
+    def add(self, vectors: np.ndarray, metadatas: List[Dict[str, Any]], dedup: bool = True):
+        """
+        Append rows. With `dedup`, rows whose path is already stored are
+        skipped; pass dedup=False to append further rows (e.g. more chunks)
+        for a path.
+        """
+        assert vectors.shape[0] == len(metadatas)
+        with self._writing():
+            self._refresh()
+
+            new_vecs = []
+            new_meta = []
+
+            for vec, m in zip(vectors, metadatas):
+                if not dedup or not self._has_path(m.get("path")):
+                    new_vecs.append(vec)
+                    new_meta.append(m)
+
+            if not new_vecs:
+                return  # nothing new to add
+
+            self._write(np.array(new_vecs, dtype=np.float32), new_meta, [])
+
+    def replace(self, path: str, vectors: np.ndarray, metadatas: List[Dict[str, Any]]):
+        """Swap the rows stored for `path` for new ones in a single generation."""
+        self.replace_many([path], vectors, metadatas)
+
+    def replace_many(self, paths: List[str], vectors: np.ndarray, metadatas: List[Dict[str, Any]]):
+        """
+        Drop every row stored for `paths` and append the given rows, all in
+        one generation: one segment, one metadata append, one manifest commit.
+        """
+        assert vectors.shape[0] == len(metadatas)
+        with self._writing():
+            view = self._refresh()
+            drop = [i for path in dict.fromkeys(paths) for i in view.paths.get(path, [])]
+            self._write(vectors, metadatas, drop)
+
+    def delete(self, path: str) -> int:
+        """Tombstone every row stored for `path`; returns the number of rows removed."""
+        with self._writing():
+            view = self._refresh()
+            rows = list(view.paths.get(path, []))
+            if rows:
+                self._write(None, [], rows)
+            return len(rows)
+
+    def update_metadata(self, updates: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Merge fields into the metadata of every row stored for each path in
+        `updates` (path -> fields), in one generation, through the patch
+        log: vectors and the metadata log are left as they are. Returns the
+        number of rows updated.
+        """
+        with self._writing():
+            view = self._refresh()
+            patches = []
+            for path, fields in updates.items():
+                rows = view.paths.get(path)
+                if rows:
+                    patches.append({"rows": list(rows), "set": fields})
+            if not patches:
+                return 0
+            data = b"".join(json.dumps(p).encode("utf-8") + b"\n" for p in patches)
+            manifest = dict(self._manifest)
+            manifest["generation"] += 1
+            manifest["patch_bytes"] = _append_log(_patch_file(manifest), manifest.get("patch_bytes", 0), data)
+            self._commit(manifest)
+            return sum(len(p["rows"]) for p in patches)
+
+    def _background_compact(self):
+        try:
+            self.compact()
+        finally:
+            self._compacting = False
+
+    def _purge(self, manifest: Dict[str, Any], view: _View, obsolete: List[Path]):
+        """
+        Rewrite segments, metadata and the IVF index without tombstoned rows.
+        Row ids are renumbered, so this updates `manifest` to a new metadata
+        log and an empty tombstone log.
+        """
+        gen = manifest["generation"]
+        live = ~view.deleted
+        segs = []
+        next_segment = manifest["next_segment"]
+        for entry, seg, start in zip(manifest["segments"], view.segs, view.starts):
+            keep = live[start:start + seg.rows]
+            if keep.all():
+                segs.append(entry)
+                continue
+            obsolete.extend(_segment_files(entry["file"]))
+            if not keep.any():
+                continue
+            name = f"seg-{next_segment:06d}.npy"
+            next_segment += 1
+            _write_segment(name, _Segment(
+                seg.codes[keep],
+                None if seg.scales is None else seg.scales[keep],
+                None if seg.full is None or seg.full is seg.codes else seg.full[keep],
+            ))
+            segs.append({"file": name, "rows": int(keep.sum())})
+
+        meta_file = f"meta-{gen:06d}.jsonl"
+        data = b"".join(json.dumps(m).encode("utf-8") + b"\n"
+                        for m, alive in zip(view.meta, live) if alive)
+        _fsync_write(STORE_DIR / meta_file, data)
+        obsolete.append(STORE_DIR / _meta_file(manifest))
+        obsolete.append(STORE_DIR / _tomb_file(manifest))
+        obsolete.append(STORE_DIR / _patch_file(manifest))
+
+        index = manifest.get("index")
+        if index:
+            new_ids = np.cumsum(live) - 1
+            new_ids[~live] = -1
+            ivf = view.index.remap(new_ids)
+            name = f"ivf-{gen:06d}.npz"
+            ivf.save(STORE_DIR / name)
+            obsolete.append(STORE_DIR / index["file"])
+            index = dict(index, file=name, rows=ivf.rows)
+
+        manifest.update(next_segment=next_segment, segments=segs, index=index,
+                        meta_file=meta_file, meta_bytes=len(data),
+                        tomb_file=f"tombstones-{gen:06d}.bin", tomb_bytes=0,
+                        patch_file=f"patches-{gen:06d}.jsonl", patch_bytes=0)
+
+    def compact(self, min_rows: int = COMPACT_MIN_ROWS, purge: Optional[bool] = None):
+        """
+        Merge runs of adjacent segments smaller than `min_rows` into one
+        segment each. Row order, and so its alignment with the metadata log,
+        is preserved. Deleted rows are dropped too when `purge` is set or,
+        by default, once they reach PURGE_RATIO of the store.
+
+        Only the write lock is held while the new files are written; searches
+        keep scoring the current generation until the commit.
+        """
+        with _write_lock():
+            self._ensure_layout()
+            with self._lock:
+                view = self._refresh()
+                manifest = dict(self._manifest)
+            # No writer can commit while the write lock is held, so `view`
+            # stays the latest generation until ours
+            manifest["generation"] += 1
+            obsolete: List[Path] = []
+
+            if purge is None:
+                purge = view.n_deleted >= PURGE_RATIO * max(1, len(view.meta))
+            if purge and view.n_deleted:
+                self._purge(manifest, view, obsolete)
+            segs = manifest["segments"]
+
+            merged: List[Dict[str, Any]] = []
+            run: List[Dict[str, Any]] = []
+            next_segment = manifest["next_segment"]
+
+            def flush_run():
+                nonlocal next_segment
+                if len(run) > 1:
+                    name = f"seg-{next_segment:06d}.npy"
+                    next_segment += 1
+                    _write_segment(name, _concat_segments([_open_segment(s["file"], manifest) for s in run]))
+                    merged.append({"file": name, "rows": sum(s["rows"] for s in run)})
+                    for s in run:
+                        obsolete.extend(_segment_files(s["file"]))
+                else:
+                    merged.extend(run)
+                run.clear()
+
+            for s in segs:
+                if s["rows"] < min_rows:
+                    run.append(s)
+                else:
+                    flush_run()
+                    merged.append(s)
+            flush_run()
+
+            if not obsolete:
+                return
+            manifest.update(next_segment=next_segment, segments=merged)
+            # Remap before dropping the old files. Readers elsewhere keep their
+            # mappings valid until they remap.
+            with self._lock:
+                self._commit(manifest)
+            for p in obsolete:
+                _unlink_quietly(p)
+
+    def build_index(self, nlist: Optional[int] = None, sample_size: int = IVF_TRAIN_SAMPLE):
+        """
+        Train an IVF index over every stored row and persist it next to the
+        segments. Defaults to about 4*sqrt(N) lists.
+        """
+        with _write_lock():
+            self._ensure_layout()
+            with self._lock:
+                view = self._refresh()
+                manifest = dict(self._manifest)
+            # Trained outside the store lock, as compact() merges, so searches continue
+            n = len(view.meta)
+            if n == 0:
+                return
+            nlist = nlist or max(1, int(4 * np.sqrt(n)))
+            rng = np.random.default_rng(0)
+            _, sample = view.gather(rng.choice(n, min(n, sample_size), replace=False), view.has_full)
+            ivf = IVFIndex.build(sample, view.float_blocks(), n, nlist)
+
+            old = manifest.get("index")
+            name = f"ivf-{manifest['generation'] + 1:06d}.npz"
+            ivf.save(STORE_DIR / name)
+            manifest.update(generation=manifest["generation"] + 1,
+                            index={"kind": "ivf", "file": name, "rows": n, "nlist": ivf.nlist})
+            with self._lock:
+                self._commit(manifest)
+            if old:
+                _unlink_quietly(STORE_DIR / old["file"])
+
+    def search(self, query_vec: np.ndarray, top_k: int = 4, index: Optional[str] = None,
+               nprobe: Optional[int] = None, rerank: Optional[int] = None) -> List[Dict[str, Any]]:
+        view = self._snapshot()
+        if not view.meta:
+            return []
+        idx, sims = view.top_k(query_vec, top_k, index, nprobe, rerank)
+        results = []
+        for i, score in zip(idx, sims):
+            item = view.meta[i].copy()
+            item["score"] = float(score)
+            results.append(item)
+        return results
+
+    def search_many(self, query_matrix: np.ndarray, top_k: int = 4) -> List[List[Dict[str, Any]]]:
+        """Exact top-k for many queries at once, scored as one GEMM per block."""
+        view = self._snapshot()
+        queries = normalize(np.atleast_2d(query_matrix))
+        if not view.meta:
+            return [[] for _ in range(queries.shape[0])]
+        ids, scores = view.exact_top_k(queries, top_k)
+        results = []
+        for row_ids, row_scores in zip(ids, scores):
+            hits = []
+            for i, score in zip(row_ids, row_scores):
+                item = view.meta[i].copy()
+                item["score"] = float(score)
+                hits.append(item)
+            results.append(hits)
+        return results
+
+    def evaluate_recall(self, queries: np.ndarray, top_k: int = 4, nprobe: Optional[int] = None,
+                        index: Optional[str] = "ivf", rerank: Optional[int] = None) -> float:
+        """
+        Mean recall@k of the given search path (IVF and/or quantized storage)
+        against exact float32 search. Quantized stores need TINY_STORE_KEEP_FULL
+        for the ground truth; use quantize.quantization_recall on a sample otherwise.
+        """
+        view = self._snapshot()
+        if index == "ivf" and view.index is None:
+            raise ValueError("No IVF index has been built")
+        if not view.has_full:
+            raise ValueError("Store is quantized without full-precision copies (TINY_STORE_KEEP_FULL)")
+        hits = 0
+        total = 0
+        for q in np.atleast_2d(queries):
+            truth, _ = view.exact_top_k(normalize(q)[None, :], top_k, full=True)
+            truth = truth[0]
+            approx, _ = view.top_k(q, top_k, index, nprobe, rerank)
+            hits += len(set(truth.tolist()) & set(approx.tolist()))
+            total += len(truth)
+        return hits / total if total else 1.0
+
+    def clear(self):
+        with self._writing():
+            self._refresh()
+            manifest = _empty_manifest()
+            manifest.update(generation=self._manifest["generation"] + 1,
+                            next_segment=self._manifest["next_segment"])
+            _write_manifest(manifest)
+            self._reset()
+            for pattern in ("meta*.jsonl", "tombstones*.bin", "patches*.jsonl", "ivf-*.npz"):
+                for p in STORE_DIR.glob(pattern):
+                    _unlink_quietly(p)
+            for p in SEGMENTS_DIR.glob("seg-*.npy"):
+                _unlink_quietly(p)
+            self._manifest = manifest
+            self._stamp = self._disk_stamp()
+
+    def already_indexed(self, path: str) -> bool:
+        self._ensure_layout()
+        with self._lock:
+            self._refresh()
+            return self._has_path(path)
+
+    def get_metadata(self, path: str) -> List[Dict[str, Any]]:
+        self._ensure_layout()
+        with self._lock:
+            view = self._refresh()
+            return [view.meta[i].copy() for i in view.paths.get(path, [])]
+
+
+_store = TinyStore()
+
+
+def add(vectors: np.ndarray, metadatas: List[Dict[str, Any]], dedup: bool = True):
+    _store.add(vectors, metadatas, dedup=dedup)
+
+
+def replace(path: str, vectors: np.ndarray, metadatas: List[Dict[str, Any]]):
+    """Replace every row stored for `path` with the given vectors and metadata."""
+    _store.replace(path, vectors, metadatas)
+
+
+def replace_many(paths: List[str], vectors: np.ndarray, metadatas: List[Dict[str, Any]]):
+    """Replace the rows of several paths with one coalesced write."""
+    _store.replace_many(paths, vectors, metadatas)
+
+
+def delete(path: str) -> int:
+    """Delete every row stored for `path`; returns the number of rows removed."""
+    return _store.delete(path)
+
+
+def search(query_vec: np.ndarray, top_k: int = 4, index: Optional[str] = None,
+           nprobe: Optional[int] = None, rerank: Optional[int] = None) -> List[Dict[str, Any]]:
+    return _store.search(query_vec, top_k=top_k, index=index, nprobe=nprobe, rerank=rerank)
+
+
+def search_many(query_matrix: np.ndarray, top_k: int = 4) -> List[List[Dict[str, Any]]]:
+    """Batched exact search: one result list per row of `query_matrix`."""
+    return _store.search_many(query_matrix, top_k=top_k)
+
+
+def build_index(nlist: Optional[int] = None):
+    """Build (or rebuild) the IVF index used when TINY_STORE_INDEX=ivf."""
+    _store.build_index(nlist)
+
+
+def evaluate_recall(queries: np.ndarray, top_k: int = 4, nprobe: Optional[int] = None,
+                    index: Optional[str] = "ivf", rerank: Optional[int] = None) -> float:
+    """Recall@k of IVF / quantized search against exact float32 search for the given queries."""
+    return _store.evaluate_recall(queries, top_k=top_k, nprobe=nprobe, index=index, rerank=rerank)
+
+
+def update_metadata(updates: Dict[str, Dict[str, Any]]) -> int:
+    """Set metadata fields on the rows of each path (path -> fields) without re-embedding them."""
+    return _store.update_metadata(updates)
+
+
+def compact(min_rows: int = COMPACT_MIN_ROWS, purge: Optional[bool] = None):
+    """Merge small vector segments into larger ones and drop deleted rows."""
+    _store.compact(min_rows, purge)
 
-def search(query_vec: np.ndarray, top_k: int = 4) -> List[Dict[str, Any]]:
-    vecs, meta = _load()
-    if vecs.shape[0] == 0:
-        return []
-    sims = cosine_similarity(query_vec.reshape(1, -1), vecs)[0]
-    idx = np.argsort(-sims)[:top_k]
-    results = []
-    for i in idx:
-        item = meta[i].copy()
-        item["score"] = float(sims[i])
-        results.append(item)
-    return results
 
 def clear():
     """Remove all vectors and metadata from the local store."""
-    if VECTORS_NPZ.exists():
-        VECTORS_NPZ.unlink()
-    if META_JSON.exists():
-        META_JSON.unlink()
+    _store.clear()
+
 
 def already_indexed(path: str) -> bool:
-    _, meta = _load()
-    return any(entry.get("path") == path for entry in meta)
+    return _store.already_indexed(path)
+
+
+def get_metadata(path: str) -> List[Dict[str, Any]]:
+    """Metadata of the live rows stored for `path` (empty if not indexed)."""
+    return _store.get_metadata(path)
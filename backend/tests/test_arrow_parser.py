@@ -0,0 +1,47 @@
+"""Run from backend/: python -m pytest tests"""
+import json
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from app.services import arrow_parser, column_profile, parser_service  # noqa: E402
+
+CSV = (
+    "order_date,shipped_at,region,amount\n"
+    "2024-01-05,2024-01-06 10:00:00,north,10.5\n"
+    "2024-02-11,,south,3\n"
+    "2023-12-30,2024-01-01 08:30:00,,7\n"
+    "2024-03-01,2024-03-02 09:15:00,north,\n"
+)
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    p = tmp_path / "orders.csv"
+    p.write_text(CSV, encoding="utf-8")
+    return p
+
+
+def test_summary_with_date_columns_is_json_safe(csv_path):
+    summary = arrow_parser.summarize_table(arrow_parser.read_csv(csv_path, max_rows=100))
+    json.dumps(summary)
+    cols = {c["name"]: c for c in summary["columns"]}
+    assert cols["order_date"]["example"] == "2024-01-05"
+    assert summary["samples"][0]["shipped_at"] == "2024-01-06T10:00:00"
+
+
+def test_full_profile_with_date_columns_is_json_safe(csv_path):
+    profile = column_profile.profile_csv(csv_path, engine="arrow")
+    json.dumps(profile)
+    cols = {c["name"]: c for c in profile["columns"]}
+    assert (cols["order_date"]["min"], cols["order_date"]["max"]) == ("2023-12-30", "2024-03-01")
+
+
+def test_null_and_unique_counts_match_pandas(csv_path, monkeypatch):
+    summaries = {}
+    for engine in ("pandas", "arrow"):
+        monkeypatch.setattr(parser_service, "PARSER_ENGINE", engine)
+        ctx = parser_service.extract_context(csv_path)
+        json.dumps(ctx, default=str)
+        summaries[engine] = {c["name"]: (c["nulls"], c["unique"]) for c in ctx["summary"]["columns"]}
+    assert summaries["arrow"] == summaries["pandas"]
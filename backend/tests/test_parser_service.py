@@ -0,0 +1,13 @@
+"""Run from backend/: python -m pytest tests"""
+import pytest
+
+from app.services import parser_service
+
+CSV = "id,name,city\n" + "".join(f"{i},name{i},Zürich\n" for i in range(200))
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-16-le", "utf-16-be"])
+def test_infer_encoding_without_bom(tmp_path, encoding):
+    p = tmp_path / "cities.csv"
+    p.write_bytes(CSV.encode(encoding))
+    assert parser_service._infer_encoding(p).lower() == encoding
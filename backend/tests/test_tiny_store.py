@@ -0,0 +1,119 @@
+"""Run from backend/: python -m pytest tests"""
+import threading
+
+import numpy as np
+import pytest
+
+from app.vectorstore import tiny_store
+
+DIM = 32
+# Noise around the cluster centres, wide enough that clusters overlap and
+# IVF recall depends on nprobe
+SPREAD = 1.0
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """A TinyStore on an empty directory; the module paths point at tmp_path."""
+    monkeypatch.setattr(tiny_store, "STORE_DIR", tmp_path)
+    monkeypatch.setattr(tiny_store, "SEGMENTS_DIR", tmp_path / "segments")
+    monkeypatch.setattr(tiny_store, "MANIFEST_JSON", tmp_path / "manifest.json")
+    monkeypatch.setattr(tiny_store, "LOCK_FILE", tmp_path / ".lock")
+    monkeypatch.setattr(tiny_store, "VECTORS_NPZ", tmp_path / "vectors.npz")
+    monkeypatch.setattr(tiny_store, "META_JSON", tmp_path / "meta.json")
+    return tiny_store.TinyStore()
+
+
+def _clustered(n: int, clusters: int = 64, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, DIM))
+    return (centers[rng.integers(clusters, size=n)] + SPREAD * rng.normal(size=(n, DIM))).astype(np.float32)
+
+
+def _queries(vecs: np.ndarray, n: int = 50) -> np.ndarray:
+    """Queries near stored rows, as a retrieval workload would issue them."""
+    rng = np.random.default_rng(1)
+    return vecs[rng.choice(len(vecs), n, replace=False)] + SPREAD * rng.normal(size=(n, DIM)).astype(np.float32)
+
+
+def _fill(store, vecs: np.ndarray, batches: int = 4):
+    for b, chunk in enumerate(np.array_split(vecs, batches)):
+        store.add(chunk, [{"path": f"f{b}.csv", "row": i} for i in range(len(chunk))], dedup=False)
+
+
+def test_ivf_recall_against_exact_search(store):
+    vecs = _clustered(4000)
+    _fill(store, vecs)
+    store.build_index(nlist=32)
+    queries = _queries(vecs)
+    recall = [store.evaluate_recall(queries, top_k=10, nprobe=n) for n in (2, 8)]
+    assert recall[0] < recall[1]
+    assert recall[1] >= 0.9
+    # Probing every list is exhaustive
+    assert store.evaluate_recall(queries, top_k=10, nprobe=32) == 1.0
+
+
+def test_int8_rerank_recall(store, monkeypatch):
+    monkeypatch.setattr(tiny_store, "STORAGE_DTYPE", "int8")
+    monkeypatch.setattr(tiny_store, "KEEP_FULL", True)
+    vecs = _clustered(4000)
+    _fill(store, vecs)
+    queries = _queries(vecs)
+    plain = store.evaluate_recall(queries, top_k=10, index=None, rerank=0)
+    reranked = store.evaluate_recall(queries, top_k=10, index=None, rerank=4)
+    assert plain >= 0.95
+    assert reranked >= max(plain, 0.99)
+
+
+def test_search_runs_while_compaction_writes(store, monkeypatch):
+    vecs = _clustered(400)
+    _fill(store, vecs, batches=8)
+    writing = threading.Event()
+    release = threading.Event()
+    write_segment = tiny_store._write_segment
+
+    def slow_write_segment(name, seg):
+        writing.set()
+        release.wait(10)
+        write_segment(name, seg)
+
+    monkeypatch.setattr(tiny_store, "_write_segment", slow_write_segment)
+    compaction = threading.Thread(target=store.compact)
+    compaction.start()
+    try:
+        assert writing.wait(10)
+        searched = []
+        search = threading.Thread(target=lambda: searched.append(store.search(vecs[0], top_k=1)))
+        search.start()
+        search.join(5)
+        assert searched and searched[0][0]["row"] == 0
+    finally:
+        release.set()
+        compaction.join(10)
+    assert len(store._manifest["segments"]) == 1
+    assert store.search(vecs[0], top_k=1)[0]["path"] == "f0.csv"
+
+
+def test_update_metadata_patches_rows_in_place(store):
+    vecs = _clustered(40)
+    _fill(store, vecs)
+    other = tiny_store.TinyStore()
+    assert other.get_metadata("f1.csv")[0].get("fingerprint") is None
+
+    fp = {"size": 10, "mtime_ns": 2, "blake2b": "ab"}
+    assert store.update_metadata({"f1.csv": {"fingerprint": fp}, "missing.csv": {"x": 1}}) == 10
+    segments = list(store._manifest["segments"])
+    assert all(m["fingerprint"] == fp for m in store.get_metadata("f1.csv"))
+    assert all("fingerprint" not in m for m in store.get_metadata("f0.csv"))
+    # Another instance picks the patch up incrementally; vectors weren't rewritten
+    assert all(m["fingerprint"] == fp for m in other.get_metadata("f1.csv"))
+    assert other._manifest["segments"] == segments
+
+    # A purge folds patches into the rewritten metadata log
+    store.delete("f0.csv")
+    store.compact(purge=True)
+    assert store._manifest["patch_bytes"] == 0
+    reloaded = tiny_store.TinyStore()
+    assert [m["row"] for m in reloaded.get_metadata("f1.csv")] == list(range(10))
+    assert all(m["fingerprint"] == fp for m in reloaded.get_metadata("f1.csv"))
+    assert reloaded.search(vecs[15], top_k=1)[0]["fingerprint"] == fp
@@ -0,0 +1,103 @@
+"""
+Benchmark JSON extraction from model output: the old greedy regex against
+ddl_generator's single-pass scanner, on large and adversarial outputs.
+
+    python benchmarks/bench_json_extract.py [--limit SECONDS]
+
+Regex runs happen in a child process and are reported as "timeout" past
+the limit; the regex backtracks exponentially in the number of newlines
+after an unclosed brace. "ok" says whether each method recovered the schema.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ddl_generator import JSONObjectScanner, extract_schema_info  # noqa: E402
+
+LEGACY = re.compile(r"\{(?:.|\n)*\}", re.DOTALL)
+
+SCHEMA = {
+    "fact_table": {
+        "name": "fact_sales",
+        "columns": [{"name": f"col_{i}", "type": "DECIMAL(12,2)", "description": "amount {net}"}
+                    for i in range(40)],
+    },
+    "dimension_tables": [
+        {"name": f"dim_{d}", "columns": [{"name": "id", "type": "INT", "description": "key"}]}
+        for d in range(10)
+    ],
+}
+
+
+def cases():
+    schema = json.dumps(SCHEMA, indent=2)
+    prose = "The model thinks about {entities} and \"quotes\" before answering.\n"
+    yield "chatty 1 MB + schema", prose * 15000 + schema + "\n" + prose * 100
+    yield "several objects", "\n".join(json.dumps({"step": i}) for i in range(20000)) + "\n" + schema
+    yield "unclosed brace + 24 newlines", "{" + "\n" * 24
+    yield "unclosed brace + 200 KB", "note: {" + "x\n" * 100000 + schema
+    yield "4000 stray braces", "{ a b" * 4000 + schema
+
+
+def _legacy(text, out):
+    start = time.perf_counter()
+    m = LEGACY.search(text)
+    elapsed = time.perf_counter() - start
+    try:
+        ok = json.loads(m.group(0)) == SCHEMA if m else False
+    except json.JSONDecodeError:
+        ok = False
+    out.put((elapsed, ok))
+
+
+def time_legacy(text, limit):
+    out = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=_legacy, args=(text, out))
+    proc.start()
+    proc.join(limit)
+    if proc.is_alive():
+        proc.terminate()
+        proc.join()
+        return None, False
+    return out.get()
+
+
+def time_scanner(text):
+    start = time.perf_counter()
+    try:
+        ok = extract_schema_info(text) == SCHEMA
+    except ValueError:
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def time_stream(text, token_chars=4):
+    scanner = JSONObjectScanner()
+    start = time.perf_counter()
+    for i in range(0, len(text), token_chars):
+        scanner.feed(text[i:i + token_chars])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--limit", type=float, default=10.0, help="seconds allowed per regex run")
+    args = parser.parse_args()
+
+    print(f"{'case':32} {'chars':>9} {'regex':>10} {'ok':>3} {'scanner':>10} {'ok':>3} {'stream/4':>10}")
+    for name, text in cases():
+        legacy, legacy_ok = time_legacy(text, args.limit)
+        legacy_s = "timeout" if legacy is None else f"{legacy * 1000:.1f}ms"
+        scanner, scanner_ok = time_scanner(text)
+        print(f"{name:32} {len(text):>9} {legacy_s:>10} {'y' if legacy_ok else 'n':>3} "
+              f"{scanner * 1000:>8.1f}ms {'y' if scanner_ok else 'n':>3} {time_stream(text) * 1000:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
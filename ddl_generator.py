@@ -1,7 +1,161 @@
 # ddl_generator.py
+import os
+import sys
 import json
 import re
-from typing import Dict, Any
+import hashlib
+import argparse
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, Deque, Iterable, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+
+# Candidates longer than this are abandoned, bounding scanner memory on
+# runaway output (e.g. a string that is never closed)
+MAX_OBJECT_CHARS = 1_000_000
+# Text is handed to the scanner in slices this long, so extraction can stop
+# at the first schema without scanning the rest of a long output
+SCAN_SLICE = 64 * 1024
+
+_OUTSIDE_STRING = re.compile(r'[{}"]')
+_INSIDE_STRING = re.compile(r'["\\]')
+
+
+class JSONObjectScanner:
+    """
+    Single-pass scanner for top-level {...} objects in free text.
+
+    Braces are balanced outside JSON strings, and string escapes are
+    honoured, so braces and quotes inside values don't confuse it. Text can
+    arrive in arbitrary pieces: `feed` returns each candidate object as
+    soon as its closing brace arrives. Prose between objects is skipped
+    with regex searches rather than per-character Python.
+
+    Objects that close inside a "{" that never does (a stray brace in prose)
+    are remembered and returned by `finish`, or when the enclosing candidate
+    outgrows `max_chars`.
+    """
+
+    def __init__(self, max_chars: int = MAX_OBJECT_CHARS):
+        self.max_chars = max_chars
+        self._reset()
+
+    def _reset(self):
+        self._parts: List[str] = []
+        self._size = 0
+        # Offsets of open braces within the candidate, and for each the
+        # (start, end) spans of complete objects directly inside it
+        self._stack: List[int] = []
+        self._inner: List[List[Tuple[int, int]]] = []
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[str]:
+        found: List[str] = []
+        i = 0
+        n = len(chunk)
+        while i < n:
+            if not self._stack:
+                start = chunk.find("{", i)
+                if start == -1:
+                    break
+                seg_start = start
+                self._stack, self._inner = [0], [[]]
+                i = start + 1
+            else:
+                seg_start = i
+            # Candidate offset of chunk index k is k + base
+            base = self._size - seg_start
+
+            while i < n and self._stack:
+                if self._escape:
+                    self._escape = False
+                    i += 1
+                    continue
+                m = (_INSIDE_STRING if self._in_string else _OUTSIDE_STRING).search(chunk, i)
+                if m is None:
+                    i = n
+                    break
+                c = m.group()
+                i = m.end()
+                if self._in_string:
+                    if c == "\\":
+                        self._escape = True
+                    else:
+                        self._in_string = False
+                elif c == '"':
+                    self._in_string = True
+                elif c == "{":
+                    self._stack.append(m.start() + base)
+                    self._inner.append([])
+                else:
+                    opened = self._stack.pop()
+                    self._inner.pop()
+                    if self._inner:
+                        self._inner[-1].append((opened, i + base))
+
+            self._parts.append(chunk[seg_start:i])
+            self._size += i - seg_start
+            if not self._stack:
+                found.append("".join(self._parts))
+                self._reset()
+            elif self._size > self.max_chars:
+                found.extend(self._nested())
+                self._reset()
+        return found
+
+    def finish(self) -> List[str]:
+        """Complete objects found inside a candidate left open at the end of input."""
+        found = self._nested()
+        self._reset()
+        return found
+
+    def _nested(self) -> List[str]:
+        text = "".join(self._parts)
+        spans = sorted(span for spans in self._inner for span in spans)
+        return [text[s:e] for s, e in spans]
+
+
+def iter_json_candidates(text: str, max_chars: int = MAX_OBJECT_CHARS) -> Iterator[str]:
+    """Balanced {...} substrings of `text`, in order of their closing brace."""
+    scanner = JSONObjectScanner(max_chars)
+    for start in range(0, len(text), SCAN_SLICE):
+        yield from scanner.feed(text[start:start + SCAN_SLICE])
+    yield from scanner.finish()
+
+
+def _parse_object(candidate: str) -> Optional[Dict[str, Any]]:
+    try:
+        data = json.loads(candidate)
+    except json.JSONDecodeError:
+        return None
+    # An empty {} is more likely prose than a schema
+    return data if isinstance(data, dict) and data else None
+
+
+def _is_star_schema(data: Dict[str, Any]) -> bool:
+    return "fact_table" in data or "dimension_tables" in data
+
+
+def take_until_json(tokens: Iterable[str]) -> Iterator[str]:
+    """
+    Pass tokens through until a star schema object has closed, then stop,
+    closing `tokens` so a streaming model call ends early. Output without
+    one is passed through whole.
+    """
+    scanner = JSONObjectScanner()
+    try:
+        for token in tokens:
+            yield token
+            for candidate in scanner.feed(token):
+                data = _parse_object(candidate)
+                if data is not None and _is_star_schema(data):
+                    return
+    finally:
+        close = getattr(tokens, "close", None)
+        if close:
+            close()
+
 
 def extract_schema_info(model_output: str) -> Dict[str, Any]:
     """
@@ -13,77 +167,504 @@ def extract_schema_info(model_output: str) -> Dict[str, Any]:
     if isinstance(model_output, dict):
         return model_output
 
-    # Search for ```json ... ``` fenced blocks first
-    m = re.search(r"```(?:json)?\s*(\{(?:.|\n)*\})\s*```", model_output, re.DOTALL | re.IGNORECASE)
-    if m:
-        json_text = m.group(1)
-    else:
-        # fallback: find the first {...} block
-        m2 = re.search(r"(\{(?:.|\n)*\})", model_output, re.DOTALL)
-        json_text = m2.group(1) if m2 else None
+    # Objects inside a ``` fence take priority over any earlier in the prose
+    fence = model_output.find("```")
+    sources = [model_output[fence:], model_output] if fence > 0 else [model_output]
 
-    if not json_text:
+    # A star schema is returned as soon as it closes; otherwise the first
+    # non-empty object wins
+    first = None
+    error = None
+    for text in sources:
+        for candidate in iter_json_candidates(text):
+            try:
+                data = json.loads(candidate)
+            except json.JSONDecodeError as e:
+                error = error or e
+                continue
+            if isinstance(data, dict) and data:
+                if _is_star_schema(data):
+                    return data
+                first = first or data
+        if first is not None:
+            return first
+
+    if error is None:
         raise ValueError("⚠️ Could not find JSON in model output. Please ensure the model returns JSON.")
+    raise ValueError(f"⚠️ Could not parse JSON from model output: {error}")
+
+
+# Column types are parsed into a family (e.g. "string", "decimal") plus their
+# numeric parameters, then rendered from the target dialect's table below.
+class SQLType(NamedTuple):
+    family: str
+    params: Tuple[int, ...]
+    # Upper-cased input, rendered as-is when the family isn't recognised
+    raw: str
 
-    try:
-        data = json.loads(json_text)
-        return data
-    except json.JSONDecodeError as e:
-        raise ValueError(f"⚠️ Could not parse JSON from model output: {e}")
+
+# Type names (longest match over the leading words) -> family
+_TYPE_ALIASES: Dict[str, str] = {
+    "varchar": "string", "character varying": "string", "char varying": "string",
+    "nvarchar": "string", "varchar2": "string", "nvarchar2": "string", "string": "string",
+    "char": "char", "character": "char", "nchar": "char", "bpchar": "char",
+    "text": "text", "tinytext": "text", "mediumtext": "text", "longtext": "text",
+    "ntext": "text", "clob": "text",
+    "tinyint": "tinyint", "byteint": "tinyint", "int1": "tinyint",
+    "smallint": "smallint", "int2": "smallint", "short": "smallint",
+    "int": "int", "integer": "int", "int4": "int", "mediumint": "int", "serial": "int",
+    "bigint": "bigint", "int8": "bigint", "int64": "bigint", "long": "bigint",
+    "bigserial": "bigint",
+    "decimal": "decimal", "numeric": "decimal", "number": "decimal", "dec": "decimal",
+    "bignumeric": "bignumeric", "bigdecimal": "bignumeric",
+    "money": "money", "smallmoney": "money",
+    "real": "real", "float4": "real", "float32": "real",
+    "float": "float",
+    "double": "double", "double precision": "double", "float8": "double", "float64": "double",
+    "bool": "boolean", "boolean": "boolean", "bit": "boolean",
+    "date": "date",
+    "time": "time", "time without time zone": "time",
+    "timestamp": "timestamp", "datetime": "timestamp", "datetime2": "timestamp",
+    "timestamp without time zone": "timestamp", "timestamp_ntz": "timestamp",
+    "smalldatetime": "timestamp",
+    "timestamptz": "timestamp_tz", "timestamp with time zone": "timestamp_tz",
+    "timestamp_tz": "timestamp_tz", "timestamp_ltz": "timestamp_tz",
+    "datetimeoffset": "timestamp_tz",
+    "binary": "binary", "varbinary": "binary", "bytea": "binary", "blob": "binary",
+    "bytes": "binary", "longblob": "binary",
+    "json": "json", "jsonb": "json", "variant": "json", "object": "json",
+    "uuid": "uuid", "uniqueidentifier": "uuid", "guid": "uuid",
+}
+_MAX_ALIAS_WORDS = max(len(name.split()) for name in _TYPE_ALIASES)
+
+# Whole-word fallbacks for names not in _TYPE_ALIASES ("unsigned int"),
+# checked in order; whole words keep POINT and INTERVAL from reading as INT
+_TYPE_HINTS: Tuple[Tuple[re.Pattern, str], ...] = tuple(
+    (re.compile(r"\b" + hint + r"\b"), family) for hint, family in (
+        ("char", "string"), ("string", "string"), ("text", "text"),
+        ("decimal", "decimal"), ("numeric", "decimal"), ("int", "int"),
+        ("timestamp", "timestamp"), ("datetime", "timestamp"), ("date", "date"),
+        ("bool", "boolean"),
+    )
+)
+# Nested types (ARRAY<STRING>, STRUCT<...>, MAP<K,V>) are passed through as-is
+_NESTED_TYPE = re.compile(r"<|\b(array|struct|map)\b")
+
+# family -> (rendering without parameters, template for "{}" = "p" or "p,s");
+# a None template drops parameters the dialect can't express
+_TypeRule = Tuple[str, Optional[str]]
+
+_ANSI_TYPES: Dict[str, _TypeRule] = {
+    "string": ("VARCHAR", "VARCHAR({})"),
+    "char": ("CHAR", "CHAR({})"),
+    "text": ("TEXT", None),
+    "tinyint": ("SMALLINT", None),
+    "smallint": ("SMALLINT", None),
+    "int": ("INT", None),
+    "bigint": ("BIGINT", None),
+    "decimal": ("DECIMAL(10,2)", "DECIMAL({})"),
+    # BigQuery BIGNUMERIC's 76 digits / scale 38 where the dialect allows it
+    "bignumeric": ("DECIMAL(76,38)", "DECIMAL({})"),
+    "money": ("DECIMAL(19,4)", None),
+    "real": ("REAL", None),
+    "float": ("FLOAT", "FLOAT({})"),
+    "double": ("DOUBLE PRECISION", None),
+    "boolean": ("BOOLEAN", None),
+    "date": ("DATE", None),
+    "time": ("TIME", "TIME({})"),
+    "timestamp": ("TIMESTAMP", "TIMESTAMP({})"),
+    "timestamp_tz": ("TIMESTAMP WITH TIME ZONE", "TIMESTAMP({}) WITH TIME ZONE"),
+    "binary": ("VARBINARY", "VARBINARY({})"),
+    "json": ("JSON", None),
+    "uuid": ("CHAR(36)", None),
+}
+
+DIALECT_TYPES: Dict[str, Dict[str, _TypeRule]] = {
+    "ansi": _ANSI_TYPES,
+    "postgres": {
+        **_ANSI_TYPES,
+        "timestamp_tz": ("TIMESTAMPTZ", "TIMESTAMPTZ({})"),
+        "money": ("MONEY", None),
+        "binary": ("BYTEA", None),
+        "json": ("JSONB", None),
+        "uuid": ("UUID", None),
+    },
+    "snowflake": {
+        **_ANSI_TYPES,
+        "tinyint": ("TINYINT", None),
+        "bignumeric": ("DECIMAL(38,9)", "DECIMAL({})"),
+        "double": ("DOUBLE", None),
+        "float": ("FLOAT", None),
+        "timestamp_tz": ("TIMESTAMP_TZ", "TIMESTAMP_TZ({})"),
+        "binary": ("BINARY", "BINARY({})"),
+        "json": ("VARIANT", None),
+        "uuid": ("VARCHAR(36)", None),
+    },
+    "bigquery": {
+        "string": ("STRING", "STRING({})"),
+        "char": ("STRING", "STRING({})"),
+        "text": ("STRING", None),
+        "tinyint": ("INT64", None),
+        "smallint": ("INT64", None),
+        "int": ("INT64", None),
+        "bigint": ("INT64", None),
+        # NUMERIC holds at most 29 integer digits and scale 9; see _bigquery_decimal
+        "decimal": ("NUMERIC", "NUMERIC({})"),
+        "bignumeric": ("BIGNUMERIC", "BIGNUMERIC({})"),
+        "money": ("NUMERIC(19,4)", None),
+        "real": ("FLOAT64", None),
+        "float": ("FLOAT64", None),
+        "double": ("FLOAT64", None),
+        "boolean": ("BOOL", None),
+        "date": ("DATE", None),
+        "time": ("TIME", None),
+        "timestamp": ("TIMESTAMP", None),
+        "timestamp_tz": ("TIMESTAMP", None),
+        "binary": ("BYTES", "BYTES({})"),
+        "json": ("JSON", None),
+        "uuid": ("STRING", None),
+    },
+    "databricks": {
+        "string": ("STRING", "VARCHAR({})"),
+        "char": ("STRING", "CHAR({})"),
+        "text": ("STRING", None),
+        "tinyint": ("TINYINT", None),
+        "smallint": ("SMALLINT", None),
+        "int": ("INT", None),
+        "bigint": ("BIGINT", None),
+        "decimal": ("DECIMAL(10,2)", "DECIMAL({})"),
+        "bignumeric": ("DECIMAL(38,9)", "DECIMAL({})"),
+        "money": ("DECIMAL(19,4)", None),
+        "real": ("FLOAT", None),
+        "float": ("DOUBLE", None),
+        "double": ("DOUBLE", None),
+        "boolean": ("BOOLEAN", None),
+        "date": ("DATE", None),
+        "time": ("STRING", None),
+        "timestamp": ("TIMESTAMP", None),
+        "timestamp_tz": ("TIMESTAMP", None),
+        "binary": ("BINARY", None),
+        "json": ("STRING", None),
+        "uuid": ("STRING", None),
+    },
+    "mysql": {
+        **_ANSI_TYPES,
+        # MySQL requires a VARCHAR length
+        "string": ("VARCHAR(255)", "VARCHAR({})"),
+        "tinyint": ("TINYINT", None),
+        "bignumeric": ("DECIMAL(65,30)", "DECIMAL({})"),
+        "float": ("FLOAT", "FLOAT({})"),
+        "double": ("DOUBLE", None),
+        "real": ("FLOAT", None),
+        "timestamp": ("DATETIME", "DATETIME({})"),
+        "timestamp_tz": ("TIMESTAMP", "TIMESTAMP({})"),
+        "binary": ("BLOB", "VARBINARY({})"),
+        "uuid": ("CHAR(36)", None),
+    },
+    "sqlserver": {
+        **_ANSI_TYPES,
+        # A bare VARCHAR is VARCHAR(1) in SQL Server
+        "string": ("VARCHAR(255)", "VARCHAR({})"),
+        "text": ("VARCHAR(MAX)", None),
+        "tinyint": ("TINYINT", None),
+        "bignumeric": ("DECIMAL(38,9)", "DECIMAL({})"),
+        "money": ("MONEY", None),
+        "float": ("FLOAT", "FLOAT({})"),
+        "double": ("FLOAT", None),
+        "boolean": ("BIT", None),
+        "timestamp": ("DATETIME2", "DATETIME2({})"),
+        "timestamp_tz": ("DATETIMEOFFSET", "DATETIMEOFFSET({})"),
+        "binary": ("VARBINARY(MAX)", "VARBINARY({})"),
+        "json": ("NVARCHAR(MAX)", None),
+        "uuid": ("UNIQUEIDENTIFIER", None),
+    },
+}
+
+# Largest (precision, scale) a DECIMAL can declare per dialect; larger
+# declarations are clamped to it. BigQuery's is BIGNUMERIC's.
+_DECIMAL_LIMITS: Dict[str, Tuple[int, int]] = {
+    "postgres": (1000, 1000),
+    "snowflake": (38, 37),
+    "bigquery": (76, 38),
+    "databricks": (38, 38),
+    "mysql": (65, 30),
+    "sqlserver": (38, 38),
+}
+
+_DIALECT_ALIASES: Dict[str, str] = {
+    "ansi": "ansi", "ansisql": "ansi", "sql": "ansi",
+    "postgres": "postgres", "postgresql": "postgres", "pg": "postgres", "redshift": "postgres",
+    "snowflake": "snowflake",
+    "bigquery": "bigquery", "bq": "bigquery",
+    "databricks": "databricks", "spark": "databricks", "sparksql": "databricks",
+    "mysql": "mysql", "mariadb": "mysql",
+    "sqlserver": "sqlserver", "mssql": "sqlserver", "tsql": "sqlserver", "azuresql": "sqlserver",
+}
+
+_TYPE_NAME = re.compile(r"[a-z_][a-z0-9_]*")
+
+
+@lru_cache(maxsize=None)
+def normalize_dialect(dialect: str) -> str:
+    """Key into DIALECT_TYPES for a display name such as "PostgreSQL" or "ANSI SQL"."""
+    key = re.sub(r"[^a-z0-9]", "", str(dialect).lower())
+    return _DIALECT_ALIASES.get(key, "ansi")
+
+
+@lru_cache(maxsize=4096)
+def parse_type(type_str: str) -> SQLType:
+    """
+    Parse a column type such as "VARCHAR(50)", "decimal(12, 2)" or
+    "timestamp(3) with time zone". Non-numeric parameters are dropped;
+    VARCHAR(MAX) parses as TEXT. Trailing words that aren't part of a type
+    name (NOT NULL, UNSIGNED) are ignored.
+    """
+    raw = type_str.strip()
+    t = raw.lower()
+    if _NESTED_TYPE.search(t):
+        return SQLType("", (), raw.upper())
+    params: Tuple[int, ...] = ()
+    unbounded = False
+    m = re.search(r"\(([^)]*)\)", t)
+    if m:
+        args = [a.strip() for a in m.group(1).split(",")]
+        unbounded = "max" in args
+        if all(a.isdigit() for a in args):
+            params = tuple(int(a) for a in args)
+        t = t[:m.start()] + " " + t[m.end():]
+
+    words = _TYPE_NAME.findall(t)
+    family = None
+    for n in range(min(len(words), _MAX_ALIAS_WORDS), 0, -1):
+        family = _TYPE_ALIASES.get(" ".join(words[:n]))
+        if family:
+            break
+    if family is None:
+        family = next((f for hint, f in _TYPE_HINTS if hint.search(t)), None)
+    if family is None:
+        return SQLType("", (), raw.upper())
+    if unbounded and family == "string":
+        family = "text"
+    return SQLType(family, params, raw.upper())
+
+
+def _bigquery_decimal(params: Tuple[int, ...]) -> str:
+    precision, scale = (params + (0,))[:2]
+    if precision - scale > 29 or scale > 9:
+        return "BIGNUMERIC(" + ",".join(map(str, params)) + ")"
+    return "NUMERIC(" + ",".join(map(str, params)) + ")"
+
+
+def _clamp_decimal(params: Tuple[int, ...], max_precision: int, max_scale: int) -> Tuple[int, ...]:
+    # Integer and fraction digits give up precision in proportion, so
+    # DECIMAL(76,38) on a 38-digit dialect is DECIMAL(38,19), not (38,38)
+    precision = min(params[0], max_precision)
+    if len(params) == 1:
+        return (precision,)
+    scale = params[1] * precision // params[0] if params[0] > precision else params[1]
+    return (precision, min(scale, max_scale, precision))
+
+
+@lru_cache(maxsize=16384)
+def _map_type(type_str: str, dialect: str) -> str:
+    parsed = parse_type(type_str)
+    if not parsed.family:
+        return parsed.raw
+    bare, template = DIALECT_TYPES[dialect][parsed.family]
+    if not parsed.params or template is None:
+        return bare
+    params = parsed.params
+    if parsed.family in ("decimal", "bignumeric") and dialect in _DECIMAL_LIMITS:
+        params = _clamp_decimal(params, *_DECIMAL_LIMITS[dialect])
+    if dialect == "bigquery" and parsed.family == "decimal":
+        return _bigquery_decimal(params)
+    return template.format(",".join(map(str, params)))
 
 
 def map_type_for_dialect(type_str: str, dialect: str) -> str:
     """
-    Basic mapping of common SQL types to dialect-specific equivalents.
-    This is intentionally lightweight — add mappings as you encounter new types.
+    Map a column type to the dialect's equivalent, keeping length,
+    precision and scale where the dialect supports them; decimal precision
+    beyond the dialect's limit is clamped to it. Unrecognised and nested
+    types are returned upper-cased. Results are memoised per (type, dialect).
     """
     if not isinstance(type_str, str):
-        # if the model gives non-string, fallback to VARCHAR
+        # if the model gives non-string, fallback to its text
         type_str = str(type_str)
+    return _map_type(type_str, normalize_dialect(dialect))
+
+
+# Identifier limit shared by Postgres (63) and MySQL (64); longer constraint
+# names are cut to fit, ending in a hash of the full name so they stay distinct
+MAX_IDENTIFIER_CHARS = 63
+# Schemas rendered per executor task, and tasks in flight per CPU; small
+# schemas render in microseconds, so one task per schema is all IPC
+BULK_CHUNK_SCHEMAS = 64
+BULK_PREFETCH = 2
+
+_TABLE_PREFIXES = ("dim_", "fact_", "fct_", "d_", "f_")
+_KEY_SUFFIXES = ("_id", "_key", "id", "key")
+
+
+def schema_tables(schema_json: Dict[str, Any]) -> List[Tuple[str, List[Dict[str, Any]]]]:
+    """
+    (table name, column dicts) pairs from either schema format, fact table
+    first. Map-format columns become {"name": ..., "type": ...}.
+    """
+    if "fact_table" in schema_json or "dimension_tables" in schema_json:
+        tables = []
+        fact = schema_json.get("fact_table") or {}
+        if fact:
+            tables.append((fact.get("name", "fact_table"), list(fact.get("columns", []))))
+        for dim in schema_json.get("dimension_tables", []):
+            tables.append((dim.get("name", "dim_table"), list(dim.get("columns", []))))
+        return tables
+    return [
+        (name, [{"name": col, "type": typ} for col, typ in cols.items()])
+        for name, cols in schema_json.items()
+        if isinstance(cols, dict)
+    ]
+
+
+def _stems(table: str) -> List[str]:
+    """Table name without its dim_/fact_ prefix, plus a singular form: dim_customers -> customers, customer."""
+    t = table.lower()
+    for prefix in _TABLE_PREFIXES:
+        if t.startswith(prefix) and len(t) > len(prefix):
+            t = t[len(prefix):]
+            break
+    if t.endswith("ies") and len(t) > 3:
+        return [t, t[:-3] + "y"]
+    if t.endswith("s") and not t.endswith("ss") and len(t) > 1:
+        return [t, t[:-1]]
+    return [t]
 
-    t = type_str.strip().lower()
 
-    # VARCHAR / STRING mapping
-    if "char" in t or "varchar" in t or t.startswith("string"):
-        if dialect.lower() == "bigquery":
-            return "STRING"
-        if dialect.lower() == "snowflake":
-            return "VARCHAR"
-        return "VARCHAR"
+def _primary_key(table: str, columns: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Explicitly flagged column ("primary_key"/"pk"), else one named after the
+    table (customer_id / customer_key for dim_customer), else "id"/"key".
+    """
+    for col in columns:
+        if col.get("primary_key") or col.get("pk"):
+            return col.get("name")
+    names = {str(col.get("name", "")).lower(): col.get("name") for col in columns}
+    candidates = [stem + s for stem in _stems(table) for s in _KEY_SUFFIXES]
+    for candidate in candidates + [table.lower() + "_id", "id", "key"]:
+        if candidate in names:
+            return names[candidate]
+    return None
+
+
+def _foreign_keys(tables: List[Tuple[str, List[Dict[str, Any]]]],
+                  pks: Dict[str, Optional[str]]) -> List[Tuple[str, str, str, str]]:
+    """
+    (table, column, referenced table, referenced column) for columns that
+    name another table's key: an explicit "references": "table.column",
+    the key column itself, or <stem>_id / <stem>_key when that key is a
+    plain "id"/"key".
+    """
+    refs: Dict[str, Tuple[str, str]] = {}
+    for name, _ in tables:
+        pk = pks[name]
+        if not pk:
+            continue
+        if pk.lower() not in ("id", "key"):
+            refs.setdefault(pk.lower(), (name, pk))
+        for stem in _stems(name):
+            for suffix in ("_id", "_key"):
+                refs.setdefault(stem + suffix, (name, pk))
+
+    fks = []
+    for name, columns in tables:
+        for col in columns:
+            col_name = col.get("name")
+            explicit = col.get("references")
+            if explicit:
+                target, _, target_col = str(explicit).replace("(", ".").rstrip(")").partition(".")
+                fks.append((name, col_name, target, target_col or pks.get(target) or col_name))
+                continue
+            if col_name == pks[name]:
+                continue
+            ref = refs.get(str(col_name).lower())
+            if ref and ref[0] != name:
+                fks.append((name, col_name, ref[0], ref[1]))
+    return fks
+
+
+def _constraint_name(*parts: str) -> str:
+    name = "_".join(parts)
+    if len(name) <= MAX_IDENTIFIER_CHARS:
+        return name
+    digest = hashlib.sha1(name.encode("utf-8")).hexdigest()[:8]
+    return name[:MAX_IDENTIFIER_CHARS - len(digest) - 1] + "_" + digest
+
+
+def _table_keys(tables: List[Tuple[str, List[Dict[str, Any]]]], constraints: bool = True
+                ) -> Tuple[Dict[str, Optional[str]], List[Tuple[str, str, str, str]]]:
+    """Primary key per table and foreign keys, as derived by _primary_key and _foreign_keys."""
+    pks = {name: _primary_key(name, columns) if constraints else None for name, columns in tables}
+    fks = _foreign_keys(tables, pks) if constraints else []
+    # An explicitly referenced column is the key of a table without one
+    columns_by_table = dict(tables)
+    for _, _, target, target_col in fks:
+        if target in pks and not pks[target] and any(
+                c.get("name") == target_col for c in columns_by_table[target]):
+            pks[target] = target_col
+    return pks, fks
+
+
+def _column_type(col: Dict[str, Any], key: str) -> str:
+    return _map_type(str(col.get("type", "VARCHAR(255)")), key)
+
+
+def _create_table(name: str, columns: List[Dict[str, Any]], pk: Optional[str], key: str) -> str:
+    column_defs = []
+    for col in columns:
+        col_name = col.get("name")
+        col_def = f"{col_name} {_column_type(col, key)}"
+        column_defs.append(col_def + " NOT NULL" if col_name == pk else col_def)
+    if pk:
+        column_defs.append(_primary_key_clause(name, pk, key))
+    return f"CREATE TABLE {name} (\n    " + ",\n    ".join(column_defs) + "\n);"
 
-    # DECIMAL / NUMERIC
-    if "decimal" in t or "numeric" in t:
-        if dialect.lower() == "bigquery":
-            return "NUMERIC"
-        return "DECIMAL(10,2)"
 
-    # INTEGER / INT mapping
-    if t in ("int", "integer") or "int" in t:
-        if dialect.lower() == "bigquery":
-            return "INT64"
-        return "INT"
+def _primary_key_clause(table: str, pk: str, key: str) -> str:
+    # BigQuery rejects a named primary key; only foreign keys take CONSTRAINT names
+    if key == "bigquery":
+        return f"PRIMARY KEY ({pk}) NOT ENFORCED"
+    return f"CONSTRAINT {_constraint_name('pk', table)} PRIMARY KEY ({pk})"
 
-    # DATE / DATETIME / TIMESTAMP
-    if "timestamp" in t or "datetime" in t:
-        if dialect.lower() == "mysql":
-            return "DATETIME"
-        if dialect.lower() == "sqlserver":
-            return "DATETIME2"
-        # postgres, snowflake, bigquery: TIMESTAMP or DATE depending
-        return "TIMESTAMP"
 
-    if "date" in t:
-        return "DATE"
+def _add_foreign_key(fk: Tuple[str, str, str, str], key: str) -> str:
+    table, col, target, target_col = fk
+    return (f"ALTER TABLE {table} ADD CONSTRAINT {_constraint_name('fk', table, col)} "
+            f"FOREIGN KEY ({col}) REFERENCES {target} ({target_col}){_enforced(key)};")
 
-    # BOOLEAN
-    if "bool" in t:
-        return "BOOLEAN"
 
-    # fallback: return original (or upper-case)
-    return type_str.upper()
+def _enforced(key: str) -> str:
+    return " NOT ENFORCED" if key == "bigquery" else ""
 
 
-def generate_ddl(schema_json: Dict[str, Any], dialect: str = "Postgres") -> str:
+def iter_ddl(schema_json: Dict[str, Any], dialect: str = "Postgres",
+             constraints: bool = True) -> Iterator[str]:
+    """
+    Yield DDL statements for a schema one at a time: a CREATE TABLE per
+    table, with its primary key inline when `constraints` is set, then an
+    ALTER TABLE ... FOREIGN KEY per relationship. Keys are derived as in
+    _primary_key and _foreign_keys. BigQuery constraints are NOT ENFORCED.
+    """
+    key = normalize_dialect(dialect)
+    tables = schema_tables(schema_json)
+    pks, fks = _table_keys(tables, constraints)
+    for name, columns in tables:
+        yield _create_table(name, columns, pks[name], key)
+    for fk in fks:
+        yield _add_foreign_key(fk, key)
+
+
+def generate_ddl(schema_json: Dict[str, Any], dialect: str = "Postgres",
+                 constraints: bool = True) -> str:
     """
     Generates DDL (CREATE TABLE statements) from a schema JSON.
     Accepts both formats:
@@ -95,43 +676,301 @@ def generate_ddl(schema_json: Dict[str, Any], dialect: str = "Postgres") -> str:
       - Or older map format:
         { "table_name": {"col_name": "TYPE", ...}, ... }
     """
-    ddl_statements = []
+    return "\n\n".join(iter_ddl(schema_json, dialect, constraints))
 
-    # STAR schema style
-    if "fact_table" in schema_json:
-        fact = schema_json.get("fact_table", {})
-        fact_name = fact.get("name", "fact_table")
-        fact_cols = []
 
-        for col in fact.get("columns", []):
-            col_name = col.get("name")
-            col_type = col.get("type", "VARCHAR(255)")
-            mapped = map_type_for_dialect(col_type, dialect)
-            fact_cols.append(f"{col_name} {mapped}")
+# ALTER TABLE templates per dialect: add column, drop column, change
+# column type, drop foreign key
+_ALTER_SYNTAX: Dict[str, Tuple[str, str, str, str]] = {
+    "ansi": ("ADD COLUMN {col} {type}", "DROP COLUMN {col}",
+             "ALTER COLUMN {col} SET DATA TYPE {type}", "DROP CONSTRAINT {name}"),
+    "postgres": ("ADD COLUMN {col} {type}", "DROP COLUMN {col}",
+                 "ALTER COLUMN {col} TYPE {type}", "DROP CONSTRAINT {name}"),
+    "snowflake": ("ADD COLUMN {col} {type}", "DROP COLUMN {col}",
+                  "ALTER COLUMN {col} SET DATA TYPE {type}", "DROP CONSTRAINT {name}"),
+    "bigquery": ("ADD COLUMN {col} {type}", "DROP COLUMN {col}",
+                 "ALTER COLUMN {col} SET DATA TYPE {type}", "DROP CONSTRAINT {name}"),
+    "databricks": ("ADD COLUMNS ({col} {type})", "DROP COLUMN {col}",
+                   "ALTER COLUMN {col} TYPE {type}", "DROP CONSTRAINT {name}"),
+    "mysql": ("ADD COLUMN {col} {type}", "DROP COLUMN {col}",
+              "MODIFY COLUMN {col} {type}", "DROP FOREIGN KEY {name}"),
+    "sqlserver": ("ADD {col} {type}", "DROP COLUMN {col}",
+                  "ALTER COLUMN {col} {type}", "DROP CONSTRAINT {name}"),
+}
 
-        ddl_statements.append(f"CREATE TABLE {fact_name} (\n    " + ",\n    ".join(fact_cols) + "\n);")
+# Primary key templates per dialect: make the key column NOT NULL before
+# ADD PRIMARY KEY (None where the key implies it), drop the primary key
+_KEY_SYNTAX: Dict[str, Tuple[Optional[str], str]] = {
+    "ansi": ("ALTER COLUMN {col} SET NOT NULL", "DROP CONSTRAINT {name}"),
+    "postgres": (None, "DROP CONSTRAINT {name}"),
+    "snowflake": ("ALTER COLUMN {col} SET NOT NULL", "DROP CONSTRAINT {name}"),
+    "bigquery": (None, "DROP PRIMARY KEY"),
+    "databricks": ("ALTER COLUMN {col} SET NOT NULL", "DROP PRIMARY KEY"),
+    "mysql": (None, "DROP PRIMARY KEY"),
+    "sqlserver": ("ALTER COLUMN {col} {type} NOT NULL", "DROP CONSTRAINT {name}"),
+}
+# Dialects that refuse to retype a primary key column under its constraint;
+# the key is dropped around the retype, which restates NOT NULL
+_RETYPE_DROPS_KEY = frozenset({"sqlserver"})
 
-        for dim in schema_json.get("dimension_tables", []):
-            dim_name = dim.get("name", "dim_table")
-            dim_cols = []
-            for col in dim.get("columns", []):
-                col_name = col.get("name")
-                col_type = col.get("type", "VARCHAR(255)")
-                mapped = map_type_for_dialect(col_type, dialect)
-                dim_cols.append(f"{col_name} {mapped}")
-            ddl_statements.append(f"CREATE TABLE {dim_name} (\n    " + ",\n    ".join(dim_cols) + "\n);")
-
-        return "\n\n".join(ddl_statements)
-
-    # fallback: handle {table: {col: type, ...}, ...}
-    for table_name, cols in schema_json.items():
-        if not isinstance(cols, dict):
+
+def _index_tables(tables: List[Tuple[str, List[Dict[str, Any]]]]
+                  ) -> Dict[str, Tuple[str, Dict[str, Dict[str, Any]]]]:
+    """lower(table) -> (table name, lower(column) -> column dict)."""
+    return {
+        str(name).lower(): (name, {str(col.get("name")).lower(): col for col in columns})
+        for name, columns in tables
+    }
+
+
+def _type_key(col: Dict[str, Any]) -> Tuple[str, Tuple[int, ...], str]:
+    parsed = parse_type(str(col.get("type", "VARCHAR(255)")))
+    return parsed.family, parsed.params, "" if parsed.family else parsed.raw
+
+
+def diff_schemas(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Table and column changes from `old` to `new`, matched by
+    case-insensitive name in a single pass over each. Types are compared
+    after parse_type, so "int" and "INTEGER" are the same type. A rename
+    shows up as a drop plus an add.
+
+    Returns {"added_tables", "dropped_tables": [table], "added_columns",
+    "dropped_columns": [(table, column)], "changed_columns": [(table,
+    column, old type, new type)]}, in `new`'s table and column order.
+    """
+    return _diff_tables(schema_tables(old), schema_tables(new))
+
+
+def _diff_tables(old: List[Tuple[str, List[Dict[str, Any]]]],
+                 new: List[Tuple[str, List[Dict[str, Any]]]]) -> Dict[str, Any]:
+    old_tables = _index_tables(old)
+    new_tables = _index_tables(new)
+    diff: Dict[str, Any] = {"added_tables": [], "dropped_tables": [], "added_columns": [],
+                            "dropped_columns": [], "changed_columns": []}
+    for table_key, (name, new_cols) in new_tables.items():
+        if table_key not in old_tables:
+            diff["added_tables"].append(name)
             continue
-        column_defs = []
-        for col_name, col_type in cols.items():
-            mapped = map_type_for_dialect(col_type, dialect)
-            column_defs.append(f"{col_name} {mapped}")
-        ddl = f"CREATE TABLE {table_name} (\n    " + ",\n    ".join(column_defs) + "\n);"
-        ddl_statements.append(ddl)
-
-    return "\n\n".join(ddl_statements)
+        old_cols = old_tables[table_key][1]
+        for col_key, col in new_cols.items():
+            before = old_cols.get(col_key)
+            if before is None:
+                diff["added_columns"].append((name, col.get("name")))
+            elif before.get("type") != col.get("type") and _type_key(before) != _type_key(col):
+                diff["changed_columns"].append((name, col.get("name"), before.get("type", "VARCHAR(255)"),
+                                                col.get("type", "VARCHAR(255)")))
+        for col_key, col in old_cols.items():
+            if col_key not in new_cols:
+                diff["dropped_columns"].append((name, col.get("name")))
+    for table_key, (name, _) in old_tables.items():
+        if table_key not in new_tables:
+            diff["dropped_tables"].append(name)
+    return diff
+
+
+def iter_alter_ddl(old: Dict[str, Any], new: Dict[str, Any], dialect: str = "Postgres",
+                   constraints: bool = True, drop: bool = True) -> Iterator[str]:
+    """
+    Yield the statements that evolve a deployed `old` schema into `new`:
+    foreign keys that no longer hold are dropped first, then primary keys
+    that changed, new tables are created, columns are added and retyped,
+    primary keys are added to existing tables, columns and removed tables
+    are dropped, and new foreign keys are added last. Type changes that
+    map to the same type in `dialect` are skipped. Foreign keys on a
+    retyped column, or pointing at a table whose primary key changes, are
+    dropped before and re-added after, since MySQL and SQL Server refuse
+    those changes under a constraint; SQL Server's primary keys likewise.
+    With drop=False no column, table or lasting constraint is dropped, so
+    a changed primary key and foreign keys that would replace an existing
+    one, or reference a key that couldn't be added, are left out.
+    """
+    key = normalize_dialect(dialect)
+    add_col, drop_col, retype_col, drop_fk = _ALTER_SYNTAX[key]
+    not_null, drop_pk = _KEY_SYNTAX[key]
+    old_tables = schema_tables(old)
+    new_tables = schema_tables(new)
+    changes = _diff_tables(old_tables, new_tables)
+
+    new_by_name = dict(new_tables)
+    new_cols = {name: {c.get("name"): c for c in columns} for name, columns in new_tables}
+    pks, new_fks = _table_keys(new_tables, constraints)
+    old_pks, old_fks = _table_keys(old_tables, constraints)
+    old_pk_by_name = {name.lower(): pk for name, pk in old_pks.items()}
+
+    retyped = []
+    for table, col, old_type, _ in changes["changed_columns"]:
+        col_type = _column_type(new_cols[table][col], key)
+        if _map_type(str(old_type), key) != col_type:
+            retyped.append((table, col, col_type))
+    # Existing tables whose primary key differs: (table, old key, new key)
+    added = {name.lower() for name in changes["added_tables"]}
+    rekeyed = []
+    for name, _ in new_tables:
+        old_pk = old_pk_by_name.get(name.lower())
+        if name.lower() not in added and (old_pk or "").lower() != (pks[name] or "").lower():
+            rekeyed.append((name, old_pk, pks[name]))
+
+    # Foreign keys matched case-insensitively on (table, column, target, target column)
+    old_fk_ids = {tuple(part.lower() for part in fk): fk for fk in old_fks}
+    new_fk_ids = {tuple(part.lower() for part in fk): fk for fk in new_fks}
+    retyped_cols = {(table.lower(), col.lower()) for table, col, _ in retyped}
+    # Without drop an existing primary key stays, so a changed one isn't added
+    rekeyed_tables = {name.lower() for name, old_pk, _ in rekeyed if drop or not old_pk}
+    unkeyed_tables = {name.lower() for name, old_pk, pk in rekeyed if pk and old_pk and not drop}
+    # Primary keys dropped around a retype of their column: table -> key column
+    held_keys = {}
+    if key in _RETYPE_DROPS_KEY:
+        for table, col, _ in retyped:
+            if table.lower() not in rekeyed_tables and (pks.get(table) or "").lower() == col.lower():
+                held_keys[table] = pks[table]
+    rebuilt = {
+        fk_id for fk_id in old_fk_ids.keys() & new_fk_ids.keys()
+        if fk_id[:2] in retyped_cols or fk_id[2:] in retyped_cols or fk_id[2] in rekeyed_tables
+    }
+    # Without drop, a new foreign key can't take over the name of an old
+    # one on the same column or point at a key that wasn't added
+    old_fk_cols = {fk_id[:2] for fk_id in old_fk_ids}
+    added_fks = [
+        fk for fk_id, fk in new_fk_ids.items()
+        if fk_id in rebuilt or (fk_id not in old_fk_ids and (drop or (
+            fk_id[:2] not in old_fk_cols and fk_id[2] not in unkeyed_tables)))
+    ]
+
+    # DROP TABLE takes a dropped table's own constraints with it
+    dropped = {name.lower() for name in changes["dropped_tables"]} if drop else set()
+    for fk_id, (table, col, _, _) in old_fk_ids.items():
+        if fk_id in rebuilt or (drop and fk_id not in new_fk_ids and fk_id[0] not in dropped):
+            name = _constraint_name("fk", table, col)
+            yield f"ALTER TABLE {table} {drop_fk.format(name=name)};"
+    for table, old_pk, _ in rekeyed:
+        if old_pk and drop:
+            yield f"ALTER TABLE {table} {drop_pk.format(name=_constraint_name('pk', table))};"
+    for table in held_keys:
+        yield f"ALTER TABLE {table} {drop_pk.format(name=_constraint_name('pk', table))};"
+    for name in changes["added_tables"]:
+        yield _create_table(name, new_by_name[name], pks[name], key)
+    for table, col in changes["added_columns"]:
+        col_type = _column_type(new_cols[table][col], key)
+        yield f"ALTER TABLE {table} {add_col.format(col=col, type=col_type)};"
+    for table, col, col_type in retyped:
+        retype = not_null if held_keys.get(table) == col else retype_col
+        yield f"ALTER TABLE {table} {retype.format(col=col, type=col_type)};"
+    for table, pk in held_keys.items():
+        yield f"ALTER TABLE {table} ADD {_primary_key_clause(table, pk, key)};"
+    for table, old_pk, pk in rekeyed:
+        if pk and table.lower() in rekeyed_tables:
+            if not_null:
+                col_type = _column_type(new_cols[table][pk], key)
+                yield f"ALTER TABLE {table} {not_null.format(col=pk, type=col_type)};"
+            yield f"ALTER TABLE {table} ADD {_primary_key_clause(table, pk, key)};"
+    if drop:
+        for table, col in changes["dropped_columns"]:
+            yield f"ALTER TABLE {table} {drop_col.format(col=col)};"
+        for name in changes["dropped_tables"]:
+            yield f"DROP TABLE {name};"
+    for fk in added_fks:
+        yield _add_foreign_key(fk, key)
+
+
+def generate_alter_ddl(old: Dict[str, Any], new: Dict[str, Any], dialect: str = "Postgres",
+                       constraints: bool = True, drop: bool = True) -> str:
+    """iter_alter_ddl joined into one script; empty when nothing changed."""
+    return "\n\n".join(iter_alter_ddl(old, new, dialect, constraints, drop))
+
+
+def _render(batch: List[Tuple[str, Dict[str, Any]]], dialects: Tuple[str, ...],
+            constraints: bool) -> List[Tuple[str, str, str]]:
+    return [(name, d, generate_ddl(schema_json, d, constraints))
+            for name, schema_json in batch for d in dialects]
+
+
+def _batches(schemas: Iterable[Tuple[str, Dict[str, Any]]], size: int) -> Iterator[List[Tuple[str, Dict[str, Any]]]]:
+    batch: List[Tuple[str, Dict[str, Any]]] = []
+    for item in schemas:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_bulk_ddl(schemas: Iterable[Tuple[str, Dict[str, Any]]], dialects: Iterable[str],
+                  executor: Optional[Executor] = None,
+                  constraints: bool = True) -> Iterator[Tuple[str, str, str]]:
+    """
+    Yield (schema name, dialect, DDL) for every (name, schema) pair in
+    `schemas` and every dialect, in input order. `schemas` is consumed
+    lazily. With an executor (e.g. a ProcessPoolExecutor) schemas are
+    rendered BULK_CHUNK_SCHEMAS at a time per task, with a bounded number
+    of tasks in flight so memory stays flat on long inputs.
+    """
+    dialects = tuple(dialects)
+    if executor is None:
+        for name, schema_json in schemas:
+            yield from _render([(name, schema_json)], dialects, constraints)
+        return
+
+    window = BULK_PREFETCH * (os.cpu_count() or 1)
+    pending: Deque[Future] = deque()
+    try:
+        for batch in _batches(schemas, BULK_CHUNK_SCHEMAS):
+            pending.append(executor.submit(_render, batch, dialects, constraints))
+            if len(pending) >= window:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+
+def write_bulk_ddl(schemas: Iterable[Tuple[str, Dict[str, Any]]], dialects: Iterable[str],
+                   out: TextIO, executor: Optional[Executor] = None,
+                   constraints: bool = True) -> int:
+    """
+    Write iter_bulk_ddl output to `out` as it is produced, each block
+    headed by a schema/dialect comment. Returns the number of blocks.
+    """
+    count = 0
+    for name, dialect, ddl in iter_bulk_ddl(schemas, dialects, executor, constraints):
+        out.write(f"-- Schema: {name}\n-- SQL Dialect: {dialect}\n{ddl}\n\n")
+        count += 1
+    return count
+
+
+def _load_schemas(paths: Iterable[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            yield os.path.splitext(os.path.basename(path))[0], extract_schema_info(f.read())
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate DDL for schema JSON files in one or more dialects.")
+    parser.add_argument("schemas", nargs="+", help="schema JSON files (raw model output is accepted)")
+    parser.add_argument("-d", "--dialect", action="append", dest="dialects",
+                        help="target dialect, repeatable (default: Postgres)")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes; 1 renders in-process")
+    parser.add_argument("--no-constraints", action="store_true", help="omit PK/FK constraints")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    big = len(args.schemas) > BULK_CHUNK_SCHEMAS
+    executor = ProcessPoolExecutor(args.workers) if args.workers > 1 and big else None
+    try:
+        count = write_bulk_ddl(_load_schemas(args.schemas), args.dialects or ["Postgres"], out,
+                               executor, constraints=not args.no_constraints)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if out is not sys.stdout:
+            out.close()
+    print(f"Wrote {count} DDL blocks", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import io
+import json
+import codecs
+from concurrent.futures import Executor
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+# CSV column types are inferred from at most this many rows, read from at
+# most this many leading bytes of the file
+CSV_SAMPLE_ROWS = 1000
+CSV_SAMPLE_BYTES = 1024 * 1024
+TXT_PREVIEW_CHARS = 400
+
+
+def _csv_prefix(data: bytes) -> bytes:
+    """
+    The first CSV_SAMPLE_BYTES of `data`, cut back to a whole line. With no
+    newline in that span (one huge line), the cap still applies and the
+    last row is read truncated.
+    """
+    if len(data) <= CSV_SAMPLE_BYTES:
+        return data
+    cut = data.rfind(b"\n", 0, CSV_SAMPLE_BYTES)
+    return data[:cut + 1] if cut > 0 else data[:CSV_SAMPLE_BYTES]
+
+
+def _infer_sql_type(col: str, dtype: str) -> str:
+    if "int" in dtype:
+        return "INT"
+    if "float" in dtype or "double" in dtype:
+        return "FLOAT"
+    if "date" in col.lower():
+        return "DATE"
+    return "STRING"
+
+
+def summarize_file(name: str, data: bytes) -> str:
+    """
+    LLM-friendly summary of one uploaded file. Module-level and given plain
+    bytes so it can run in a worker process.
+    """
+    filename = name.lower()
+    try:
+        if filename.endswith(".csv"):
+            df = pd.read_csv(io.BytesIO(data), nrows=CSV_SAMPLE_ROWS)
+            inferred = {col: _infer_sql_type(col, str(df[col].dtype)) for col in df.columns}
+            return (
+                f"File: {name}\n"
+                f"Type: CSV\n"
+                f"Columns & Types: {inferred}\n"
+                f"Sample Row: {df.head(1).to_dict(orient='records')[0]}"
+            )
+
+        if filename.endswith(".json"):
+            doc = json.loads(data)
+            # If JSON is a list of dicts, infer keys
+            if isinstance(doc, list) and len(doc) > 0 and isinstance(doc[0], dict):
+                keys = list(doc[0].keys())
+                return (
+                    f"File: {name}\n"
+                    f"Type: JSON\n"
+                    f"Top-Level Keys: {keys}\n"
+                    f"Sample Entry: {doc[0]}"
+                )
+            return (
+                f"File: {name}\n"
+                f"Type: JSON\n"
+                f"Content Preview: {str(doc)[:400]}"
+            )
+
+        if filename.endswith(".txt"):
+            # final=False: the byte slice may end inside a multi-byte character
+            text = codecs.getincrementaldecoder("utf-8")().decode(data, final=False)[:TXT_PREVIEW_CHARS]
+            return (
+                f"File: {name}\n"
+                f"Type: TXT\n"
+                f"Content Preview: {text}"
+            )
+
+    except Exception as e:
+        return f"Error processing {name}: {e}"
+    return ""
+
+
+def _payload(name: str, data: bytes) -> bytes:
+    """Only the part of a file its summary reads, to keep worker IPC small."""
+    filename = name.lower()
+    if filename.endswith(".csv"):
+        return _csv_prefix(data)
+    if filename.endswith(".txt"):
+        return data[:TXT_PREVIEW_CHARS * 4]  # at most 4 bytes per UTF-8 character
+    return data
+
+
+def extract_file_context(files: List[Tuple[str, bytes]], executor: Optional[Executor] = None) -> str:
+    """
+    Extract structured, LLM-friendly summaries from (name, bytes) pairs
+    instead of dumping full content. With an executor, files are profiled
+    in parallel; output keeps the input order either way.
+    """
+    names = [name for name, _ in files]
+    payloads = [_payload(name, data) for name, data in files]
+    if executor is not None and len(files) > 1:
+        snippets = list(executor.map(summarize_file, names, payloads))
+    else:
+        snippets = [summarize_file(n, p) for n, p in zip(names, payloads)]
+    context_snippets = [s for s in snippets if s]
+    return "\n\n".join(context_snippets) if context_snippets else ""
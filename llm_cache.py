@@ -0,0 +1,213 @@
+import os
+import re
+import json
+import time
+import logging
+import sqlite3
+import hashlib
+import threading
+import importlib.util
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# One file next to this module, so the Streamlit app, main.py and the backend
+# (which loads this module by file location) share entries
+LLM_CACHE_PATH = Path(os.getenv(
+    "LLM_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "llm_responses.sqlite3")
+))
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") == "1"
+# Entries older than this many seconds are misses; 0 keeps them until evicted
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+# On-disk size bound; least recently used rows are evicted down to 90% of it
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+_WHITESPACE = re.compile(r"\s+")
+
+logger = logging.getLogger(__name__)
+
+
+def _load_sqlite_lru():
+    # The table helper the backend's embedding cache uses, by file location:
+    # this module also runs inside the backend, where the repo root isn't on
+    # sys.path and backend/app can't be imported as a package from here
+    path = Path(__file__).resolve().parent / "backend" / "app" / "utils" / "sqlite_lru.py"
+    spec = importlib.util.spec_from_file_location("sqlite_lru", path)
+    module = importlib.util.module_from_spec(spec)  # type: ignore
+    spec.loader.exec_module(module)  # type: ignore
+    return module
+
+
+SQLiteLRU = _load_sqlite_lru().SQLiteLRU
+
+
+def normalize_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """
+    Messages reduced to what matters for the response: role, and content
+    with each whitespace run (indentation, blank lines, trailing spaces)
+    collapsed to a single space.
+    """
+    return [
+        {
+            "role": str(m.get("role", "user")).strip().lower(),
+            "content": _WHITESPACE.sub(" ", str(m.get("content", ""))).strip(),
+        }
+        for m in messages
+    ]
+
+
+def cache_key(model: str, messages: List[Dict[str, Any]], options: Optional[Dict[str, Any]] = None) -> str:
+    """sha256 over (model, normalized messages, options), ignoring unset options."""
+    opts = {k: v for k, v in (options or {}).items() if v not in (None, "")}
+    payload = json.dumps([model, normalize_messages(messages), opts], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Model responses in a SQLite table shared by every process on the host.
+
+    Lookups refresh `last_used` and treat rows older than `ttl` as misses;
+    inserts drop expired rows and evict the least recently used ones once
+    the table grows past `max_bytes`.
+    """
+
+    def __init__(self, path: Path = LLM_CACHE_PATH, ttl: float = LLM_CACHE_TTL,
+                 max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.rejected = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._store = SQLiteLRU(
+            path, "responses",
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, response TEXT NOT NULL,"
+            " nbytes INTEGER NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL",
+            max_bytes,
+        )
+
+    def _failed(self, action: str, exc: Exception):
+        # A locked database or read-only .cache/ must not fail the model call:
+        # log, drop the connection and carry on uncached
+        self.errors += 1
+        logger.warning("LLM cache %s failed, continuing without it: %s", action, exc)
+        self._store.close()
+
+    def _fresh_after(self, now: float) -> float:
+        return now - self.ttl if self.ttl > 0 else float("-inf")
+
+    def get(self, key: str) -> Optional[str]:
+        """The fresh response under `key`; None on a miss or when the cache is unusable."""
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._store.conn().execute(
+                    "SELECT response FROM responses WHERE key=? AND created_at>?", (key, self._fresh_after(now))
+                ).fetchone()
+                if row is not None:
+                    self._store.touch([key], now)
+            except (sqlite3.Error, OSError) as e:
+                self._failed("lookup", e)
+                return None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model: str, response: str) -> bool:
+        """Store `response`; False when the cache is unusable."""
+        now = time.time()
+        with self._lock:
+            try:
+                db = self._store.conn()
+                db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model, response, len(response.encode("utf-8")), now, now),
+                )
+                db.execute("DELETE FROM responses WHERE created_at<=?", (self._fresh_after(now),))
+                db.commit()
+                self._store.evict()
+            except (sqlite3.Error, OSError) as e:
+                self._failed("store", e)
+                return False
+            self.stores += 1
+            return True
+
+    def reject(self):
+        """Count a response that wasn't stored because it failed validation."""
+        with self._lock:
+            self.rejected += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            try:
+                entries, nbytes = self._store.size()
+            except (sqlite3.Error, OSError) as e:
+                self._failed("stats", e)
+                entries, nbytes = None, None
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "rejected": self.rejected,
+                "errors": self.errors,
+                "disk_entries": entries,
+                "disk_bytes": nbytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+
+
+_cache = ResponseCache()
+
+
+def get(model: str, messages: List[Dict[str, Any]], options: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    if not LLM_CACHE_ENABLED:
+        return None
+    return _cache.get(cache_key(model, messages, options))
+
+
+def put(model: str, messages: List[Dict[str, Any]], response: str,
+        options: Optional[Dict[str, Any]] = None,
+        validate: Optional[Callable[[str], bool]] = None) -> bool:
+    """
+    Store `response` if it is non-blank and passes `validate`; returns
+    whether it was stored. Failed or truncated outputs are never cached.
+    """
+    if not LLM_CACHE_ENABLED:
+        return False
+    if not response.strip() or (validate is not None and not validate(response)):
+        _cache.reject()
+        return False
+    return _cache.put(cache_key(model, messages, options), model, response)
+
+
+def cached(model: str, messages: List[Dict[str, Any]], compute: Callable[[], str],
+           options: Optional[Dict[str, Any]] = None,
+           validate: Optional[Callable[[str], bool]] = None) -> str:
+    """The cached response for this request, else `compute()`, stored when it validates."""
+    hit = get(model, messages, options)
+    if hit is not None:
+        return hit
+    response = compute()
+    put(model, messages, response, options, validate)
+    return response
+
+
+def stats() -> Dict[str, Any]:
+    """Hit/miss/store counters for this process and size of the shared cache."""
+    return _cache.stats()
+
+
+def clear():
+    _cache.clear()
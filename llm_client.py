@@ -0,0 +1,53 @@
+import os
+import threading
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+import ollama
+
+LLM_MODEL = os.getenv("LLM_MODEL", "llama3")
+OLLAMA_HOST = os.getenv("OLLAMA_HOST")
+# How long the server keeps the model loaded after a request, so follow-up
+# prompts skip the load
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "8"))
+
+_client: Optional[ollama.Client] = None
+_client_lock = threading.Lock()
+
+
+def client() -> ollama.Client:
+    """Process-wide Client; its httpx pool keeps connections alive between calls."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ollama.Client(
+                host=OLLAMA_HOST,
+                limits=httpx.Limits(max_connections=OLLAMA_MAX_CONNECTIONS,
+                                    max_keepalive_connections=OLLAMA_MAX_CONNECTIONS),
+            )
+        return _client
+
+
+def _messages(prompt: str) -> List[Dict[str, str]]:
+    return [{"role": "user", "content": prompt}]
+
+
+def generate(prompt: str, json_format: bool = False, model: str = LLM_MODEL) -> str:
+    """
+    Complete `prompt` in one response. `json_format` asks the server to
+    constrain output to a single valid JSON value.
+    """
+    resp = client().chat(model=model, messages=_messages(prompt),
+                         format="json" if json_format else "", keep_alive=KEEP_ALIVE)
+    return resp["message"]["content"].strip()
+
+
+def stream(prompt: str, json_format: bool = False, model: str = LLM_MODEL) -> Iterator[str]:
+    """`generate`, yielding text as the model produces it."""
+    parts = client().chat(model=model, messages=_messages(prompt), stream=True,
+                          format="json" if json_format else "", keep_alive=KEEP_ALIVE)
+    for part in parts:
+        token = part["message"]["content"]
+        if token:
+            yield token
@@ -1,15 +1,27 @@
+import re
+
 from ollama import chat
 
+import llm_cache
+
+MODEL = "llama3"
+
+
+def _has_create_table(output):
+    return re.search(r"\bcreate\s+table\b", output, re.IGNORECASE) is not None
+
 
 def prompt_to_schema(prompt):
-    response = chat(
-        model="llama3",
-        messages=[
-            {"role": "system", "content": "You are a data modeling expert."},
-            {"role": "user", "content": f"Create a SQL schema for the following: {prompt}"}
-        ]
+    messages = [
+        {"role": "system", "content": "You are a data modeling expert."},
+        {"role": "user", "content": f"Create a SQL schema for the following: {prompt}"}
+    ]
+    # Only answers containing a CREATE TABLE are kept in the shared cache
+    return llm_cache.cached(
+        MODEL, messages,
+        lambda: chat(model=MODEL, messages=messages)['message']['content'],
+        validate=_has_create_table,
     )
-    return response['message']['content']
 
 if __name__ == "__main__":
     print("💡 Enter your data modeling prompt below:")
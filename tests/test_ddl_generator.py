@@ -0,0 +1,123 @@
+"""Run from the repository root: python -m pytest tests"""
+import pytest
+
+import ddl_generator
+from ddl_generator import map_type_for_dialect
+
+
+@pytest.mark.parametrize("type_str, dialect, expected", [
+    ("varchar(50)", "MySQL", "VARCHAR(50)"),
+    ("string", "SQL Server", "VARCHAR(255)"),
+    ("unsigned int", "BigQuery", "INT64"),
+    ("decimal(12,2)", "BigQuery", "NUMERIC(12,2)"),
+    ("decimal(40,2)", "BigQuery", "BIGNUMERIC(40,2)"),
+    ("bignumeric", "Postgres", "DECIMAL(76,38)"),
+    ("money", "Snowflake", "DECIMAL(19,4)"),
+])
+def test_map_type(type_str, dialect, expected):
+    assert map_type_for_dialect(type_str, dialect) == expected
+
+
+@pytest.mark.parametrize("type_str", ["ARRAY<STRING>", "map<string,string>", "STRUCT<a INT64>"])
+@pytest.mark.parametrize("dialect", ["BigQuery", "Databricks", "MySQL", "SQL Server"])
+def test_nested_types_pass_through(type_str, dialect):
+    assert map_type_for_dialect(type_str, dialect) == type_str.upper()
+
+
+@pytest.mark.parametrize("type_str", ["POINT", "INTERVAL"])
+def test_hints_match_whole_words(type_str):
+    assert map_type_for_dialect(type_str, "Postgres") == type_str
+
+
+@pytest.mark.parametrize("type_str, dialect, expected", [
+    ("DECIMAL(50,10)", "Snowflake", "DECIMAL(38,7)"),
+    ("DECIMAL(50,10)", "SQL Server", "DECIMAL(38,7)"),
+    ("DECIMAL(70,20)", "MySQL", "DECIMAL(65,18)"),
+    ("BIGNUMERIC(76,38)", "Databricks", "DECIMAL(38,19)"),
+    ("BIGNUMERIC(76,38)", "BigQuery", "BIGNUMERIC(76,38)"),
+    ("DECIMAL(50,10)", "Postgres", "DECIMAL(50,10)"),
+    ("DECIMAL(38,38)", "MySQL", "DECIMAL(38,30)"),
+])
+def test_decimal_precision_clamped_to_dialect(type_str, dialect, expected):
+    assert map_type_for_dialect(type_str, dialect) == expected
+
+
+def test_long_constraint_names_stay_distinct():
+    table = "fact_very_long_table_name_for_customer_orders_and_returns"
+    names = {
+        ddl_generator._constraint_name("fk", table, col)
+        for col in ("customer_account_identifier_primary_key", "customer_account_identifier_secondary_key")
+    }
+    assert len(names) == 2
+    assert all(len(n) <= ddl_generator.MAX_IDENTIFIER_CHARS for n in names)
+    assert ddl_generator._constraint_name("pk", "dim_date") == "pk_dim_date"
+
+
+OLD = {
+    "fact_sales": {"sale_id": "int", "customer_id": "int", "amount": "decimal(12,2)"},
+    "dim_customer": {"customer_id": "int", "name": "varchar(100)"},
+    "dim_date": {"day": "date"},
+}
+
+
+def _alter(new, dialect="Postgres", old=OLD, **kwargs):
+    return list(ddl_generator.iter_alter_ddl(old, new, dialect, **kwargs))
+
+
+def _before(statements, first, second):
+    return statements.index(first) < statements.index(second)
+
+
+def test_unchanged_schema_needs_no_statements():
+    assert _alter(OLD) == []
+
+
+def test_new_key_column_gets_primary_key_before_foreign_key():
+    new = {**OLD,
+           "fact_sales": {**OLD["fact_sales"], "date_id": "int"},
+           "dim_date": {"date_id": "int", "day": "date"}}
+    out = _alter(new)
+    pk = "ALTER TABLE dim_date ADD CONSTRAINT pk_dim_date PRIMARY KEY (date_id);"
+    fk = ("ALTER TABLE fact_sales ADD CONSTRAINT fk_fact_sales_date_id "
+          "FOREIGN KEY (date_id) REFERENCES dim_date (date_id);")
+    assert _before(out, "ALTER TABLE dim_date ADD COLUMN date_id INT;", pk)
+    assert _before(out, pk, fk)
+
+
+def test_mysql_rebuilds_foreign_key_around_retype():
+    new = {**OLD,
+           "fact_sales": {**OLD["fact_sales"], "customer_id": "bigint"},
+           "dim_customer": {**OLD["dim_customer"], "customer_id": "bigint"}}
+    out = _alter(new, "MySQL")
+    drop = "ALTER TABLE fact_sales DROP FOREIGN KEY fk_fact_sales_customer_id;"
+    add = ("ALTER TABLE fact_sales ADD CONSTRAINT fk_fact_sales_customer_id "
+           "FOREIGN KEY (customer_id) REFERENCES dim_customer (customer_id);")
+    for retype in ("ALTER TABLE fact_sales MODIFY COLUMN customer_id BIGINT;",
+                   "ALTER TABLE dim_customer MODIFY COLUMN customer_id BIGINT;"):
+        assert _before(out, drop, retype)
+        assert _before(out, retype, add)
+
+
+def test_sqlserver_drops_primary_key_around_retype_of_its_column():
+    new = {**OLD,
+           "fact_sales": {**OLD["fact_sales"], "customer_id": "bigint"},
+           "dim_customer": {**OLD["dim_customer"], "customer_id": "bigint"}}
+    out = _alter(new, "SQL Server")
+    retype = "ALTER TABLE dim_customer ALTER COLUMN customer_id BIGINT NOT NULL;"
+    assert _before(out, "ALTER TABLE fact_sales DROP CONSTRAINT fk_fact_sales_customer_id;",
+                   "ALTER TABLE dim_customer DROP CONSTRAINT pk_dim_customer;")
+    assert _before(out, "ALTER TABLE dim_customer DROP CONSTRAINT pk_dim_customer;", retype)
+    assert _before(out, retype, "ALTER TABLE dim_customer ADD CONSTRAINT pk_dim_customer PRIMARY KEY (customer_id);")
+    # The foreign key side isn't a key column and keeps its nullability
+    assert "ALTER TABLE fact_sales ALTER COLUMN customer_id BIGINT;" in out
+
+
+def test_changed_foreign_key_target():
+    new = {**OLD, "dim_customer": {"id": "int", "name": "varchar(100)"}}
+    out = _alter(new, drop=False)
+    assert not any("FOREIGN KEY" in s or "PRIMARY KEY" in s or "DROP" in s for s in out)
+    out = _alter(new)
+    assert _before(out, "ALTER TABLE fact_sales DROP CONSTRAINT fk_fact_sales_customer_id;",
+                   "ALTER TABLE dim_customer DROP CONSTRAINT pk_dim_customer;")
+    assert out[-1] == ("ALTER TABLE fact_sales ADD CONSTRAINT fk_fact_sales_customer_id "
+                       "FOREIGN KEY (customer_id) REFERENCES dim_customer (id);")